@@ -0,0 +1,151 @@
+"""
+Copyright 2009 Richard Quirk
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may not
+use this file except in compliance with the License. You may obtain a copy of
+the License at http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations under
+the License.
+
+An asyncio API for linting many files without blocking the event loop.
+Requires Python 3.6 or later.
+
+    async for result in lint_paths(paths, concurrency=4):
+        for linenumber, category, message in result.errors:
+            ...
+
+Files are read in the loop's default executor and linted in a pool of
+worker processes. Results are yielded as each file is finished, which is not
+necessarily the order the paths were given in. Cancelling the task that is
+iterating, or closing the iterator early, cancels the files that have not
+been linted yet.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import os
+
+import cmakelint.main as lint
+
+# ignored is True for files that are not linted, as they are not CMake files
+# or are generated
+LintResult = collections.namedtuple('LintResult', 'filename errors ignored')
+
+class _Collector(object):
+    """
+    Keeps the errors that get past the filters in a worker process
+    """
+    def __init__(self):
+        self.errors = []
+        self.ignored = False
+
+    def Error(self, filename, linenumber, category, message):
+        self.errors.append((linenumber, category, message))
+
+    def Ignore(self, filename):
+        self.ignored = True
+
+    def Skip(self, filename, reason):
+        self.ignored = True
+
+def GetSettings():
+    """
+    The settings from the current lint state that the workers need
+    """
+    state = lint._lint_state
+    return (list(state.filters), state.spaces, state.linelength, state.block_indent,
+            state.include_generated, list(state.skip_patterns), list(state.skip_banners),
+            state.max_size)
+
+def _LintContents(filename, contents, settings):
+    """
+    Lint the contents of a file in a worker process. The checks read the
+    global lint state, which is put back afterwards.
+    """
+    state = lint._CMakeLintState()
+    (state.filters, state.spaces, state.linelength, state.block_indent,
+     state.include_generated, state.skip_patterns, state.skip_banners,
+     state.max_size) = settings
+    collector = _Collector()
+    state.reporter = collector
+    saved_state = lint._lint_state
+    lint._lint_state = state
+    try:
+        lint.ProcessFile(filename, contents)
+    finally:
+        lint._lint_state = saved_state
+    return LintResult(filename, collector.errors, collector.ignored)
+
+async def _LintPath(loop, executor, path, settings):
+    if not lint.IsValidFile(path):
+        return LintResult(path, [], True)
+    # generated and oversized files are skipped here, before they are read
+    # in full
+    contents, reason = await loop.run_in_executor(None, lint.ReadFileUnlessSkipped, path)
+    if reason is not None:
+        return LintResult(path, [], True)
+    return await loop.run_in_executor(executor, _LintContents, path, contents, settings)
+
+async def _Shutdown(loop, executor, cancelled):
+    """
+    Stop the workers, waiting for them in another thread unless the files
+    that are still queued can be cancelled instead
+    """
+    if cancelled:
+        try:
+            executor.shutdown(wait=False, cancel_futures=True)
+            return
+        except TypeError:
+            # cancel_futures is new in Python 3.9. Before that, workers that
+            # are left running can hang the interpreter at exit. The tasks
+            # that were cancelled have cancelled their files, so only those
+            # being linted are waited for.
+            pass
+    await loop.run_in_executor(None, executor.shutdown)
+
+async def lint_paths(paths, concurrency=None, executor=None):
+    """
+    Lint the files in paths, yielding a LintResult for each one as it is
+    finished. At most concurrency files are read or linted at once, using
+    the settings of the current lint state. The worker processes are
+    started here and stopped once the iterator is done, unless an executor
+    is given. It has to be a ProcessPoolExecutor, as the checks use global
+    state that threads would share.
+    """
+    if concurrency is None:
+        concurrency = os.cpu_count() or 1
+    if concurrency < 1:
+        raise ValueError('concurrency should be at least 1')
+    if (executor is not None and
+            not isinstance(executor, concurrent.futures.ProcessPoolExecutor)):
+        raise ValueError('executor should be a ProcessPoolExecutor')
+    loop = asyncio.get_event_loop()
+    owned = executor is None
+    if owned:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=concurrency)
+    settings = GetSettings()
+    paths = iter(paths)
+    pending = set()
+    finished = False
+    try:
+        while True:
+            while len(pending) < concurrency:
+                path = next(paths, None)
+                if path is None:
+                    break
+                pending.add(asyncio.ensure_future(_LintPath(loop, executor, path, settings)))
+            if not pending:
+                finished = True
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        if owned:
+            await _Shutdown(loop, executor, not finished)
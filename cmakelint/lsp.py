@@ -0,0 +1,393 @@
+"""
+Copyright 2009 Richard Quirk
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may not
+use this file except in compliance with the License. You may obtain a copy of
+the License at http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations under
+the License.
+
+Language Server Protocol support, used by "cmakelint --lsp".
+
+Each open document keeps its CleansedLines and the errors found on each line.
+When the document is edited only the changed lines, any command that runs
+into them and any line whose place in the if() and other blocks changed are
+linted again. The file level checks are cheap and are run each time
+diagnostics are published. The filtered diagnostics of each line are kept, and
+only the lines linted again are filtered again unless the pragmas changed.
+"""
+import heapq
+import itertools
+import json
+import os
+import sys
+
+import cmakelint.__version__
+import cmakelint.main as lint
+
+try:
+    from urllib.parse import unquote, urlparse
+except ImportError:
+    from urllib import unquote
+    from urlparse import urlparse
+
+_PRAGMA_START = '# lint_cmake: '
+_SEVERITY_WARNING = 2
+_METHOD_NOT_FOUND = -32601
+
+def UriToFilename(uri):
+    parsed = urlparse(uri)
+    if parsed.scheme != 'file':
+        return uri
+    return unquote(parsed.path)
+
+def SplitLines(text):
+    """
+    Split document text into lines without their line endings, as
+    _ProcessFile does. Returns the lines and whether each had a carriage
+    return.
+    """
+    lines = text.split('\n')
+    crs = [line.endswith('\r') for line in lines]
+    return [line.rstrip('\r') for line in lines], crs
+
+def _IgnoreError(unused_filename, unused_linenumber, unused_category, unused_message):
+    pass
+
+class Document(object):
+    """
+    An open document and the errors found on each of its lines. Line
+    numbers are indexes into the CleansedLines, which has an extra line at
+    either end, so document line n is at index n + 1.
+    """
+    def __init__(self, uri, text):
+        self.uri = uri
+        self.filename = UriToFilename(uri)
+        lines, crs = SplitLines(text)
+        self.clean_lines = lint.CleansedLines(
+                ['# Lines start at 1'] + lines + ['# Lines end here'])
+        count = len(self.clean_lines.lines)
+        self.crs = [False] + crs + [False]
+        self.pragmas = [line.startswith(_PRAGMA_START)
+                        for line in self.clean_lines.raw_lines]
+        # errors from the per line checks on each line, before filtering
+        self.errors = [None] * count
+        # whether each line includes or uses FindPackageHandleStandardArgs
+        self.included = [False] * count
+        self.used = [False] * count
+        # the diagnostics for the errors on each line that pass the filters,
+        # kept between publishes, and the lines to filter again
+        self.filtered = [()] * count
+        self.dirty = set()
+        # the filters they were filtered with, or None if every line has to
+        # be filtered again
+        self.filtered_with = None
+        self.first_command = None
+        self.case_convention = None
+        self._FindCaseConvention(0)
+        self._LintLines(0, count)
+
+    def _FindCaseConvention(self, start):
+        """
+        Find the first command that is not in mixed case, starting at start.
+        Its case is the convention the rest of the file has to follow.
+        """
+        lines = self.clean_lines.lines
+        self.first_command = None
+        self.case_convention = None
+        for i in range(start, len(lines)):
+            command = lint.GetCommand(lines[i])
+            if command and not lint.IsCommandMixedCase(command):
+                self.first_command = i
+                self.case_convention = lint.IsCommandUpperCase(command)
+                return
+
+    def _LintLines(self, start, stop):
+        """
+        Run the per line checks on lines start to stop, keeping the errors
+        unfiltered. Pragmas are applied when diagnostics are published.
+        """
+        clean_lines = self.clean_lines
+        # The first command sets the convention when a whole file is linted
+        # in order. Setting it up front gives the same answers for any range.
+        clean_lines.have_seen_uppercase = self.case_convention
+        saved_filters = lint._lint_state.filters
+        saved_package_state = lint._package_state
+        try:
+            lint._lint_state.filters = []
+            for i in range(start, stop):
+                found = []
+                errors = lambda filename, linenumber, category, message: \
+                        found.append((category, message))
+                package_state = lint._package_state = lint._CMakePackageState()
+                lint.ProcessLine(self.filename, i, clean_lines, errors)
+                self.errors[i] = found or None
+                self.dirty.add(i)
+                self.included[i] = package_state.have_included_stdargs
+                self.used[i] = package_state.have_used_stdargs
+        finally:
+            lint._lint_state.filters = saved_filters
+            lint._package_state = saved_package_state
+
+    def Replace(self, start, end, lines, crs):
+        """
+        Replace the lines from index start up to end and lint again the lines
+        whose results may have changed
+        """
+        clean_lines = self.clean_lines
+        stop, moved = clean_lines.Replace(start, end, lines)
+        count = len(lines)
+        shift = count - (end - start)
+        pragmas = [line.startswith(_PRAGMA_START) for line in lines]
+        if any(self.pragmas[start:end]) or any(pragmas):
+            # the filters of every line may have changed
+            self.filtered_with = None
+        self.crs[start:end] = crs
+        self.pragmas[start:end] = pragmas
+        self.errors[start:end] = [None] * count
+        self.included[start:end] = [False] * count
+        self.used[start:end] = [False] * count
+        self.filtered[start:end] = [()] * count
+        self.dirty = set(i if i < start else i + shift
+                         for i in self.dirty if not start <= i < end)
+        if shift:
+            # the lines after the edit have moved
+            moved_from = start + count
+            for i in itertools.compress(range(moved_from, len(self.filtered)),
+                                        self.filtered[moved_from:]):
+                span = self.filtered[i][0]['range']
+                span['start']['line'] = span['end']['line'] = i - 1
+        # A command that starts before the edit and has not been closed by
+        # then looks at the edited lines too
+        first = start
+        while first > 1 and ')' not in clean_lines.lines[first - 1]:
+            first -= 1
+        if self.first_command is None or start <= self.first_command:
+            old_convention = self.case_convention
+            self._FindCaseConvention(start)
+            if self.case_convention != old_convention:
+                self._LintLines(0, len(clean_lines.lines))
+                return
+        self._LintLines(first, stop)
+        # lines outside the edit whose blocks changed
+        for i in moved:
+            if not first <= i < stop:
+                self._LintLines(i, i + 1)
+
+    def ApplyChange(self, change):
+        """
+        Apply a TextDocumentContentChangeEvent
+        """
+        if 'range' not in change:
+            self.__init__(self.uri, change['text'])
+            return
+        raw_lines = self.clean_lines.raw_lines
+        start = change['range']['start']
+        end = change['range']['end']
+        start_line = min(start['line'] + 1, len(raw_lines) - 2)
+        end_line = min(end['line'] + 1, len(raw_lines) - 2)
+        prefix = raw_lines[start_line][:start['character']]
+        suffix = raw_lines[end_line][end['character']:]
+        if self.crs[end_line]:
+            suffix += '\r'
+        lines, crs = SplitLines(prefix + change['text'] + suffix)
+        self.Replace(start_line, end_line + 1, lines, crs)
+
+    def Diagnostics(self):
+        """
+        Return the errors that pass the filters, applying the pragmas in the
+        same order as _ProcessFile. Only the lines linted again since the
+        last call are filtered again, unless the pragmas or the filters
+        changed.
+        """
+        state = lint._CMakeLintState()
+        state.filters = list(lint._lint_state.filters)
+        state.linelength = lint._lint_state.linelength
+        state.spaces = lint._lint_state.spaces
+        raw_lines = self.clean_lines.raw_lines
+        count = len(raw_lines)
+        pragma_lines = list(itertools.compress(range(count), self.pragmas))
+        # _ProcessFile applies all the pragmas before the file level checks
+        for i in pragma_lines:
+            lint.CheckLintPragma(self.filename, i, raw_lines[i], None, state)
+
+        diagnostics = []
+        def Found(filename, linenumber, category, message):
+            if state.ShouldPrint(category):
+                diagnostics.append(self._Diagnostic(self._Range(linenumber),
+                                                    category, message))
+
+        lint.CheckFileName(self.filename, Found)
+        if any(self.crs) and os.linesep != '\r\n':
+            Found(self.filename, 0, 'whitespace/newline',
+                  'Unexpected carriage return found; better to use only \\n')
+        filters = list(lint._lint_state.filters)
+        if self.filtered_with != filters:
+            self.filtered_with = filters
+            self.filtered = [()] * count
+            self.dirty = set(itertools.compress(range(count), self.errors))
+        # the pragmas before a line decide its filters, so they are applied
+        # on the way
+        previous = None
+        for i in heapq.merge(pragma_lines, sorted(self.dirty)):
+            if i == previous:
+                continue
+            previous = i
+            if self.pragmas[i]:
+                lint.CheckLintPragma(self.filename, i, raw_lines[i], _IgnoreError, state)
+            found = []
+            for category, message in self.errors[i] or ():
+                if state.ShouldPrint(category):
+                    if not found:
+                        span = self._Range(i)
+                    found.append(self._Diagnostic(span, category, message))
+            self.filtered[i] = found or ()
+        self.dirty = set()
+        diagnostics.extend(itertools.chain.from_iterable(
+                itertools.compress(self.filtered, self.filtered)))
+
+        package_state = lint._CMakePackageState()
+        package_state.have_included_stdargs = any(self.included)
+        package_state.have_used_stdargs = any(self.used)
+        package_state.Done(self.filename, Found)
+        return diagnostics
+
+    def _Range(self, linenumber):
+        line = max(linenumber - 1, 0)
+        length = 0
+        if 0 < linenumber < len(self.clean_lines.raw_lines) - 1:
+            length = len(self.clean_lines.raw_lines[linenumber])
+        return {
+            'start': {'line': line, 'character': 0},
+            'end': {'line': line, 'character': length},
+        }
+
+    def _Diagnostic(self, span, category, message):
+        # the diagnostics on a line share its range, so that it can be
+        # moved in one go
+        return {
+            'range': span,
+            'severity': _SEVERITY_WARNING,
+            'code': category,
+            'source': 'cmakelint',
+            'message': message,
+        }
+
+def ReadMessage(stream):
+    """
+    Read a JSON-RPC message with its Content-Length header, or return None
+    at the end of the stream
+    """
+    length = None
+    while True:
+        header = stream.readline()
+        if not header:
+            return None
+        header = header.decode('ascii').strip()
+        if not header:
+            break
+        name, _, value = header.partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    if length is None:
+        return None
+    return json.loads(stream.read(length).decode('utf-8'))
+
+def WriteMessage(stream, message):
+    body = json.dumps(message).encode('utf-8')
+    stream.write(('Content-Length: %d\r\n\r\n' % len(body)).encode('ascii'))
+    stream.write(body)
+    stream.flush()
+
+class Server(object):
+    """
+    A language server that publishes cmakelint errors as diagnostics
+    """
+    def __init__(self, instream, outstream):
+        self.instream = instream
+        self.outstream = outstream
+        self.documents = {}
+        self.shutdown = False
+
+    def Run(self):
+        while True:
+            message = ReadMessage(self.instream)
+            if message is None:
+                return 1
+            if message.get('method') == 'exit':
+                return 0 if self.shutdown else 1
+            self.Handle(message)
+
+    def Handle(self, message):
+        method = message.get('method')
+        params = message.get('params') or {}
+        handler = getattr(self, '_' + (method or '').replace('/', '_'), None)
+        if handler is None:
+            if 'id' in message and method is not None:
+                WriteMessage(self.outstream, {
+                    'jsonrpc': '2.0',
+                    'id': message['id'],
+                    'error': {'code': _METHOD_NOT_FOUND,
+                              'message': 'Method not found: %s' % method},
+                })
+            return
+        result = handler(params)
+        if 'id' in message:
+            WriteMessage(self.outstream, {'jsonrpc': '2.0', 'id': message['id'],
+                                          'result': result})
+
+    def Publish(self, uri, diagnostics):
+        WriteMessage(self.outstream, {
+            'jsonrpc': '2.0',
+            'method': 'textDocument/publishDiagnostics',
+            'params': {'uri': uri, 'diagnostics': diagnostics},
+        })
+
+    def _initialize(self, params):
+        return {
+            'capabilities': {
+                # 2 is incremental sync
+                'textDocumentSync': {'openClose': True, 'change': 2},
+            },
+            'serverInfo': {'name': 'cmakelint',
+                           'version': cmakelint.__version__.VERSION},
+        }
+
+    def _initialized(self, params):
+        pass
+
+    def _shutdown(self, params):
+        self.shutdown = True
+
+    def _textDocument_didOpen(self, params):
+        item = params['textDocument']
+        if not lint.IsValidFile(UriToFilename(item['uri'])):
+            return
+        document = Document(item['uri'], item['text'])
+        self.documents[item['uri']] = document
+        self.Publish(document.uri, document.Diagnostics())
+
+    def _textDocument_didChange(self, params):
+        document = self.documents.get(params['textDocument']['uri'])
+        if document is None:
+            return
+        for change in params['contentChanges']:
+            document.ApplyChange(change)
+        self.Publish(document.uri, document.Diagnostics())
+
+    def _textDocument_didClose(self, params):
+        uri = params['textDocument']['uri']
+        if self.documents.pop(uri, None) is not None:
+            self.Publish(uri, [])
+
+    def _textDocument_didSave(self, params):
+        pass
+
+def Serve():
+    instream = getattr(sys.stdin, 'buffer', sys.stdin)
+    outstream = getattr(sys.stdout, 'buffer', sys.stdout)
+    return Server(instream, outstream).Run()
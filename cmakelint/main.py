@@ -16,17 +16,85 @@ import sys
 import re
 import os
 import getopt
+import collections
+import fnmatch
+import hashlib
+import heapq
+import io
+import json
+import multiprocessing
+import subprocess
+import tarfile
+import threading
+import time
+import zipfile
+import zlib
 import cmakelint.__version__
 
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
 if sys.version_info < (3,):
     # xrange slightly faster than range on python2
     range = xrange
 
 _RE_COMMAND = re.compile(r'^\s*(\w+)(\s*)\(', re.VERBOSE)
 _RE_COMMAND_START_SPACES = re.compile(r'^\s*\w+\s*\((\s*)', re.VERBOSE)
-_RE_COMMAND_END_SPACES = re.compile(r'(\s*)\)', re.VERBOSE)
-_RE_LOGIC_CHECK = re.compile(r'(\w+)\s*\(\s*\S+[^)]+\)', re.VERBOSE)
+# \b stops the search trying every suffix of a long word, which made it
+# quadratic in the line length
+_RE_LOGIC_CHECK = re.compile(r'\b(\w+)\s*\(\s*\S+[^)]+\)', re.VERBOSE)
 _RE_COMMAND_ARG = re.compile(r'(\w+)', re.VERBOSE)
+# the characters that start a quoted argument, a comment or a bracket
+# argument, for CleanComments. A bracket argument only starts at the start
+# of an argument, so a[[b is an unquoted argument.
+_RE_CLEAN_SIGNIFICANT = re.compile(r'["#]|(?<![^\s(])\[=*\[')
+# a bracket argument or a bracket comment
+_RE_CLEAN_BRACKET = re.compile(r'(?:(?<![^\s(])|#)\[=*\[')
+_RE_CLEAN_BRACKET_COMMENT = re.compile(r'#\[(=*)\[')
+# the rest of a quoted argument, up to its closing quote. A backslash
+# escapes the character after it, so \\" closes the argument but \" does not.
+_RE_CLEAN_QUOTE_END = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_MAX_READ_THREADS = 8
+# the line cache only pays off when most lines repeat, so it is off by
+# default
+_DEFAULT_LINE_CACHE_SIZE = 0
+# Files that CMake and its modules write out, by path
+_DEFAULT_SKIP_PATTERNS = [
+    'cmake_install.cmake',
+    'CTestTestfile.cmake',
+    'CPackConfig.cmake',
+    'CPackSourceConfig.cmake',
+    '*ConfigVersion.cmake',
+    '*-config-version.cmake',
+    '*/CMakeFiles/*',
+]
+# Comments near the start of a file that mark it as generated. The
+# *Targets.cmake files written by install(EXPORT) are found by their banner,
+# as modules such as CTestTargets.cmake are written by hand.
+_DEFAULT_SKIP_BANNERS = [
+    r'^# Generated CMake target import file',
+    r'^#.*\bGenerated by\b',
+    r'^#.*\bDO NOT EDIT\b',
+    r'^# CMake generated',
+    r'^# Install script for directory:',
+]
+# how much of the start of a file is searched for a banner
+_BANNER_SIZE = 512
+# no limit unless one is given
+_DEFAULT_MAX_SIZE = 0
+_DEFAULT_SPLIT_LINES = 50000
+# chunks per --split-jobs worker, so that one slow chunk does not hold up
+# the others
+_SPLIT_CHUNKS_PER_JOB = 4
+_TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.xz', '.txz', '.tar.bz2', '.tbz2')
 _logic_commands = """
 else
 endforeach
@@ -35,16 +103,45 @@ endif
 endmacro
 endwhile
 """.split()
+# the command that ends each kind of block
+_BLOCK_OPENERS = {
+    'foreach': 'endforeach',
+    'function': 'endfunction',
+    'if': 'endif',
+    'macro': 'endmacro',
+    'while': 'endwhile',
+}
+# the command that starts the block each of these are part of
+_BLOCK_CLOSERS = dict((end, start) for start, end in _BLOCK_OPENERS.items())
+_BLOCK_MIDDLES = {
+    'else': 'if',
+    'elseif': 'if',
+}
 _USAGE = """
 Syntax: cmakelint.py [--version] [--config=file] [--filter=-x,+y] [--spaces=N]
-                     [--quiet] [--linelength=digits]
-        <file> [file] ...
+                     [--quiet] [--linelength=digits] [--metrics-file=file]
+                     [--files-from=file] [--null] [--stdin-filename=name]
+                     [--read-ahead=N] [--dedupe] [--shard=i/N]
+                     [--shard-output=file] [--profile-config=name:file] ...
+                     [--git-rev=rev] [--line-cache=N] [--block-indent]
+                     [--include-generated] [--max-size=bytes] [--store=file]
+                     [--split-jobs=N] [--split-lines=N]
+        <file|archive> [file|archive] ...
+        cmakelint.py --lsp
+        cmakelint.py merge [--quiet] <shard-output> [shard-output] ...
+        cmakelint.py query [--run=id] [--since=id] [--limit=N] [--path=path]
+                           [--category=category] <store> <question>
     filter=-x,+y,...
       Specify a comma separated list of filters to apply
 
     spaces=N
       Indentation should be a multiple of N spaces
 
+    block-indent
+      Commands should be indented by N spaces for each if(), foreach(),
+      while(), function() or macro() block they are inside. This can also
+      be turned on with a "block-indent" line in the config file.
+
     config=file
       Use the given file for configuration. By default the file
       ~/.config/cmakelintrc, $XDG_CONFIG_DIR/cmakelintrc or ~/.cmakelintrc is
@@ -52,6 +149,20 @@ Syntax: cmakelint.py [--version] [--config=file] [--filter=-x,+y] [--spaces=N]
       (./None for a file called literally None) Only the option "filter=" is
       currently supported in this file.
 
+    include-generated
+      Lint generated files too. By default files that CMake writes out, such
+      as cmake_install.cmake, and files with a comment such as "Generated
+      by", "Generated CMake target import file" or "DO NOT EDIT" near the
+      start are skipped without being read in full. Each one skipped is
+      listed, as "Skipping file: name (generated)". The config file can add to these with
+      lines such as "skip=*/build/*" for paths (or file names, if there is
+      no /) and "skip-banner=regex" for comments.
+
+    max-size=bytes
+      Skip files larger than this without reading them, listing each one
+      as "Skipping file: name (too large)". The default is 0, which means
+      no limit. Can also be set with "max-size=" in the config file.
+
     quiet makes output quiet unless errors occurs
       Mainly used by automation tools when parsing huge amount of files.
       In those cases actual error might get lost in the pile of other stats
@@ -68,8 +179,110 @@ Syntax: cmakelint.py [--version] [--config=file] [--filter=-x,+y] [--spaces=N]
       Examples:
         --linelength=120
 
+    files-from=file
+      Read the names of the files to lint from the given file, one per line,
+      in addition to any given on the command line. Use "-" to read the list
+      from stdin. The list is read as the files are linted, so it may be
+      arbitrarily long.
+
+    null
+      Entries in the files-from list are separated by NUL characters rather
+      than newlines, as produced by "find -print0".
+
+    stdin-filename=name
+      Lint the contents piped on stdin, reporting errors against the given
+      file name. Useful for editors that want to lint unsaved buffers.
+
+    read-ahead=N
+      Read up to N files ahead of the one being linted using a small pool of
+      threads. This hides the latency of slow or network file systems. The
+      output is the same as without read-ahead. The default is 0, which reads
+      each file just before linting it.
+
+    dedupe
+      Lint files with identical contents only once. Checks that depend on
+      the file name are run for every file, and the errors found in the
+      first copy are reported again for each of the others.
+
+    shard=i/N
+      Split the files into N shards by a hash of their names and only lint
+      those in shard i, counting from 1. Each CI node can be given the same
+      file list and a different shard.
+
+    shard-output=file
+      Write the results of this run to the given file as JSON, instead of
+      printing them, so that they can be combined with "cmakelint.py merge".
+
+    lsp
+      Run a Language Server Protocol server on stdin and stdout instead of
+      linting files. Open documents are linted again as they are edited,
+      looking only at the lines that changed.
+
+    merge
+      Combine the shard-output files of all the shards of a run. The output
+      and exit status are the same as for a single run over all the files.
+      To lint a file called merge, use ./merge.
+
+    store=file
+      Add the errors of this run to the given SQLite database, creating it
+      if needed. Each run is written in one transaction along with its
+      totals, so the history of a project can be kept in one file.
+
+    query
+      Answer a question about the runs in a store: "runs" lists them,
+      "files" and "categories" count the errors of a run by file or by
+      category, "errors" prints them, limited to --path or --category if
+      given, and "regressions" shows where a run has more errors than the
+      one given by --since. The latest run and the one before it are used
+      unless --run or --since say otherwise. To lint a file called query,
+      use ./query.
+
+    split-jobs=N
+      Lint files of at least split-lines lines (50000 by default) in N
+      worker processes. The file is split into chunks where no command is
+      open and the chunks are linted in parallel. The output is the same as
+      linting the file in one go. The default is 0, which does not split
+      files. Files linted with --profile-config are not split, and files
+      over --max-size are skipped before they could be, so any size limit
+      should be above the size of the files to split.
+
+    profile-config=name:file
+      Lint with the settings in the given config file and report the errors
+      with each line prefixed by [name]. Give this more than once to report
+      on several profiles in one run. Each file is read and cleaned once, and
+      the checks run once for each distinct spaces, linelength and
+      block-indent setting. The filter, spaces, linelength and block-indent
+      options on the command line apply to every profile, and the usual
+      config file is not used by them.
+
+    git-rev=rev
+      Lint the CMake files in the tree of the given git revision, read from
+      the object store of the repository in the current directory. This
+      works in bare repositories, for example in a pre-receive hook. Any
+      files given are used as paths to limit the files linted to.
+
+    line-cache=N
+      Keep the results of the checks that only depend on the line itself for
+      up to N distinct lines, so that lines which repeat across files, such
+      as endif(), are only checked once. This is only quicker when well over
+      half the lines are repeats, as in generated or templated trees, so
+      the default is 0, which turns the cache off. The hit rate is included
+      in the metrics file.
+
+    metrics-file=file
+      Write a JSON document with run metrics to the given file once all the
+      files have been processed. This includes the number of files seen,
+      linted and skipped, the total number of lines, wall time, CPU time
+      (including that of --split-jobs workers), throughput, peak memory
+      use, line cache hits, the number of generated and oversized files
+      skipped and the number of errors per category.
+
     version
       Show the version number and end
+
+    Archives ending in .tar, .tar.gz, .tgz, .tar.xz, .tar.bz2 or .zip are
+    read without extracting them. The CMake files inside are linted and
+    reported as archive.tar.gz!path/CMakeLists.txt.
 """
 _ERROR_CATEGORIES = """\
         convention/filename
@@ -102,6 +315,65 @@ def DefaultRC():
 
 _DEFAULT_CMAKELINTRC = DefaultRC()
 
+class _TextReporter(object):
+    """
+    Prints errors as they are found
+    """
+    def Error(self, filename, linenumber, category, message):
+        print('%s:%d: %s [%s]' % (filename, linenumber, message, category))
+
+    def Ignore(self, filename):
+        print('Ignoring file: ' + filename)
+
+    def Skip(self, filename, reason):
+        print('Skipping file: %s (%s)' % (filename, reason))
+
+class _ShardReporter(object):
+    """
+    Keeps the errors of each file for --shard-output. Files are recorded
+    with their position in the full list of files so that the results of
+    all the shards can be put back in order.
+    """
+    def __init__(self):
+        self.indexes = collections.deque()
+        self.files = []
+
+    def StartFile(self, filename, index=None):
+        if index is None:
+            index = self.indexes.popleft()
+        self.files.append({
+            'index': index,
+            'path': filename,
+            'ignored': False,
+            'skipped': None,
+            'errors': [],
+        })
+
+    def StartMember(self, name):
+        """
+        Start a file inside the archive given to the last StartFile. It
+        shares the position of the archive in the list of files.
+        """
+        self.StartFile(name, self.files[-1]['index'])
+
+    def Error(self, filename, linenumber, category, message):
+        self.files[-1]['errors'].append([linenumber, category, message])
+
+    def Ignore(self, filename):
+        self.files[-1]['ignored'] = True
+
+    def Skip(self, filename, reason):
+        self.files[-1]['skipped'] = reason
+
+    def Write(self, filename, shard, quiet):
+        with open(filename, 'w') as output:
+            json.dump({
+                'version': cmakelint.__version__.VERSION,
+                'shard': list(shard),
+                'quiet': quiet,
+                'files': self.files,
+            }, output)
+
 class _CMakeLintState(object):
     def __init__(self):
         self.filters = []
@@ -111,18 +383,50 @@ class _CMakeLintState(object):
         self.linelength = 80
         self.allowed_categories = _ERROR_CATEGORIES.split()
         self.quiet = False
+        self.metrics_file = None
+        self.reporter = _TextReporter()
+        self.shard = None
+        self.shard_output = None
+        self.lsp = False
+        # cached ShouldPrintError answers, see ShouldPrint
+        self._filter_list = None
+        self._filter_results = {}
+        self.files_from = None
+        self.files_from_delimiter = '\n'
+        self.stdin_filename = None
+        self.read_ahead = 0
+        self.dedupe = False
+        # (name, config file) for each --profile-config, and the (name,
+        # state) of each profile once the files have been read
+        self.profile_configs = []
+        self.profiles = []
+        self.git_rev = None
+        self.line_cache_size = _DEFAULT_LINE_CACHE_SIZE
+        self.block_indent = False
+        self.include_generated = False
+        self.skip_patterns = list(_DEFAULT_SKIP_PATTERNS)
+        self.skip_banners = [re.compile(b, re.MULTILINE) for b in _DEFAULT_SKIP_BANNERS]
+        self.max_size = _DEFAULT_MAX_SIZE
+        self.store = None
+        self.split_jobs = 0
+        self.split_lines = _DEFAULT_SPLIT_LINES
+        # generated and oversized files skipped
+        self.skipped = 0
 
     def SetFilters(self, filters):
         if not filters:
             return
         assert isinstance(self.filters, list)
         if isinstance(filters, list):
-            self.filters.extend(filters)
+            new_filters = list(filters)
         elif isinstance(filters, str):
-            self.filters.extend([f.strip() for f in filters.split(',') if f])
+            new_filters = [f.strip() for f in filters.split(',') if f]
         else:
             raise ValueError('Filters should be a list or a comma separated string')
-        for f in self.filters:
+        # Only the new filters need checking, the earlier ones were checked
+        # when they were added. Checking them all made a file full of
+        # pragmas quadratic.
+        for f in new_filters:
             if f.startswith('-') or f.startswith('+'):
                 allowed = False
                 for c in self.allowed_categories:
@@ -132,6 +436,27 @@ class _CMakeLintState(object):
                     raise ValueError('Filter not allowed: %s'%f)
             else:
                 raise ValueError('Filter should start with - or +')
+        self.filters.extend(new_filters)
+
+    def ShouldPrint(self, category):
+        """
+        Apply the filters to category. The answer for each category is kept
+        and only the filters added since then are applied next time, as
+        pragmas only ever add to the list.
+        """
+        if self._filter_list is not self.filters:
+            self._filter_list = self.filters
+            self._filter_results = {}
+        should_print, checked = self._filter_results.get(category, (True, 0))
+        if checked > len(self.filters):
+            should_print, checked = True, 0
+        for f in self.filters[checked:]:
+            if f.startswith('-') and category.startswith(f[1:]):
+                should_print = False
+            elif f.startswith('+') and category.startswith(f[1:]):
+                should_print = True
+        self._filter_results[category] = (should_print, len(self.filters))
+        return should_print
 
     def SetSpaces(self, spaces):
         self.spaces = int(spaces.strip())
@@ -142,6 +467,59 @@ class _CMakeLintState(object):
     def SetLineLength(self, linelength):
         self.linelength = int(linelength)
 
+    def SetShard(self, shard):
+        index, count = [int(x) for x in shard.split('/')]
+        if count < 1 or index < 1 or index > count:
+            raise ValueError('shard should be i/N with 1 <= i <= N')
+        self.shard = (index, count)
+
+    def SetReadAhead(self, read_ahead):
+        read_ahead = int(read_ahead)
+        if read_ahead < 0:
+            raise ValueError('read ahead should not be negative')
+        self.read_ahead = read_ahead
+
+    def SetSplitJobs(self, jobs):
+        jobs = int(jobs)
+        if jobs < 0:
+            raise ValueError('split jobs should not be negative')
+        self.split_jobs = jobs
+
+    def SetSplitLines(self, lines):
+        lines = int(lines)
+        if lines < 1:
+            raise ValueError('split lines should be at least 1')
+        self.split_lines = lines
+
+    def AddSkipPatterns(self, patterns):
+        self.skip_patterns.extend(p.strip() for p in patterns.split(',') if p.strip())
+
+    def AddSkipBanner(self, banner):
+        try:
+            self.skip_banners.append(re.compile(banner, re.MULTILINE))
+        except re.error as ex:
+            raise ValueError('Bad skip-banner %s: %s' % (banner, ex))
+
+    def SetMaxSize(self, max_size):
+        max_size = int(max_size)
+        if max_size < 0:
+            raise ValueError('max size should not be negative')
+        self.max_size = max_size
+
+    def SetLineCacheSize(self, size):
+        size = int(size)
+        if size < 0:
+            raise ValueError('line cache size should not be negative')
+        self.line_cache_size = size
+
+    def AddProfileConfig(self, profile):
+        name, _, filename = profile.partition(':')
+        if not name or not filename:
+            raise ValueError('profile config should be NAME:FILE')
+        if name in [n for n, _ in self.profile_configs]:
+            raise ValueError('profile %s given more than once' % name)
+        self.profile_configs.append((name, filename))
+
 class _CMakePackageState(object):
     def __init__(self):
         self.sets = []
@@ -152,7 +530,7 @@ class _CMakePackageState(object):
         pass
 
     def _GetExpected(self, filename):
-        package = os.path.basename(filename)
+        package = os.path.basename(GetMemberName(filename))
         package = re.sub('^Find(.*)\.cmake', lambda m: m.group(1), package)
         return package.upper()
 
@@ -196,66 +574,496 @@ class _CMakePackageState(object):
     def Set(self, var):
         self.sets.append(var)
 
+class _CMakeLintMetrics(object):
+    """
+    Counters for a whole run, written out by --metrics-file
+    """
+    def __init__(self):
+        self.files_seen = 0
+        self.files_linted = 0
+        self.files_skipped = 0
+        self.files_deduplicated = 0
+        self.files_generated = 0
+        self.files_oversized = 0
+        self.lines = 0
+        self.line_cache_hits = 0
+        self.line_cache_misses = 0
+        self.categories = {}
+        self.start_wall = time.time()
+        self.start_cpu = GetCPUTime()
+
+    def AddError(self, category):
+        self.categories[category] = self.categories.get(category, 0) + 1
+
+    def Results(self):
+        wall = time.time() - self.start_wall
+        cpu = GetCPUTime() - self.start_cpu
+        categories = dict((c, 0) for c in _ERROR_CATEGORIES.split())
+        categories.update(self.categories)
+        lookups = self.line_cache_hits + self.line_cache_misses
+        return {
+            'version': cmakelint.__version__.VERSION,
+            'files_seen': self.files_seen,
+            'files_linted': self.files_linted,
+            'files_skipped': self.files_skipped,
+            'files_deduplicated': self.files_deduplicated,
+            'files_generated': self.files_generated,
+            'files_oversized': self.files_oversized,
+            'lines': self.lines,
+            'errors': _lint_state.errors,
+            'wall_time': wall,
+            'cpu_time': cpu,
+            'files_per_second': Rate(self.files_linted, wall),
+            'lines_per_second': Rate(self.lines, wall),
+            'line_cache_hits': self.line_cache_hits,
+            'line_cache_misses': self.line_cache_misses,
+            'line_cache_hit_rate': self.line_cache_hits / float(lookups) if lookups else None,
+            'peak_rss_bytes': GetPeakRSS(),
+            'categories': categories,
+        }
+
+def GetCPUTime():
+    """
+    User and system time of this process and of the child processes that
+    have finished, such as the --split-jobs workers
+    """
+    times = os.times()
+    return times[0] + times[1] + times[2] + times[3]
+
+def GetPeakRSS():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform != 'darwin':
+        peak *= 1024
+    return peak
+
+def Rate(count, seconds):
+    if seconds <= 0:
+        return None
+    return count / float(seconds)
+
 _lint_state = _CMakeLintState()
 _package_state = _CMakePackageState()
+_lint_metrics = _CMakeLintMetrics()
+# lint results of files seen so far, by contents, for --dedupe
+_content_cache = {}
 
-def CleanComments(line, quote=False):
+class _LineResult(object):
     """
-    quote means 'was in a quote starting this line' so that
-    quoted lines can be eaten/removed.
+    The results of the checks that only look at the line itself and the
+    settings. The errors are (category, message) pairs, in the order that
+    ProcessLine reports them, split where the checks that depend on the
+    rest of the file go.
     """
-    if line.find('#') == -1 and line.find('"') == -1:
-        if quote:
-            return '', quote
+    def __init__(self, head, is_upper, indent, middle, check_end, tail):
+        # line length and mixed case commands
+        self.head = head
+        # case of the command for CheckCaseConvention, or None
+        self.is_upper = is_upper
+        # indentation, unless it depends on the blocks the line is in
+        self.indent = indent
+        # spaces around the command
+        self.middle = middle
+        # whether the command ends on a later line
+        self.check_end = check_end
+        # tabs, trailing spaces and repeated logic
+        self.tail = tail
+
+class _CleansedLine(object):
+    """
+    A single line that looks like a CleansedLines to the checks. Commands
+    that are not closed on the line are not closed at all.
+    """
+    def __init__(self, raw_line, line):
+        self.have_seen_uppercase = None
+        self.raw_lines = [raw_line]
+        self.lines = [line]
+
+    def GetCommandEnd(self, linenumber):
+        if ')' in self.lines[linenumber]:
+            return linenumber
+        return None
+
+class _LineResultCache(object):
+    """
+    A bounded cache of _LineResult by line and settings. The same lines,
+    such as endif(), turn up again and again across a tree. When the cache
+    is full the least recently used result is dropped.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.results = collections.OrderedDict()
+
+    def Get(self, filename, raw_line, line):
+        key = (raw_line, line, _lint_state.spaces, _lint_state.linelength,
+               _lint_state.block_indent)
+        result = self.results.pop(key, None)
+        if result is None:
+            _lint_metrics.line_cache_misses += 1
+            result = GetLineResult(filename, raw_line, line)
+            if len(self.results) >= self.size:
+                self.results.popitem(last=False)
         else:
+            _lint_metrics.line_cache_hits += 1
+        self.results[key] = result
+        return result
+
+_line_cache = _LineResultCache(_DEFAULT_LINE_CACHE_SIZE)
+
+def CleanComments(line, quote=False):
+    """
+    Remove comments, and the text inside quoted and bracket arguments, from
+    a line. quote is the state at the start of the line, as returned for
+    the line before: False, True inside a quoted argument, or the ]=] that
+    closes the bracket argument the line starts in. For a bracket comment
+    it is prefixed with #. The quotes and brackets around arguments are
+    kept.
+    """
+    if quote is False and '"' not in line and (
+            '[' not in line or not _RE_CLEAN_BRACKET.search(line)):
+        if '#' not in line:
             return line, quote
-    # else have to check for comment
+        # rstrip removes trailing space between end of command and the comment # start
+        return line[:line.index('#')].rstrip(), quote
+    if quote is not False and quote is not True:
+        return _CleanBrackets(line, quote)
+    if '[' in line and _RE_CLEAN_BRACKET.search(line):
+        return _CleanBrackets(line, quote)
+    if '\\"' in line:
+        # an escaped quote is dropped, in or out of a quoted argument
+        if '\\\\' in line:
+            # split off the escaped backslashes first, so that \\" is left
+            pieces = line.split('\\\\')
+            line = '\\\\'.join([piece.replace('\\"', '\\') for piece in pieces])
+        else:
+            line = line.replace('\\"', '\\')
+    # every other quote starts or ends a quoted argument, so splitting the
+    # line on them leaves the text outside the quoted arguments at every
+    # other index
+    parts = line.split('"')
+    if quote:
+        if len(parts) == 1:
+            return '', quote
+        cleaned = '"' + '""'.join(parts[1::2])
+        closed = len(parts) % 2 == 0
+    else:
+        cleaned = '""'.join(parts[::2])
+        closed = len(parts) % 2 == 1
+    comment = cleaned.find('#')
+    if comment != -1:
+        return cleaned[:comment].rstrip(), False
+    if closed:
+        return cleaned.rstrip(), False
+    # the last quoted argument carries on to the next line
+    return cleaned + '"', True
+
+def _CleanBrackets(line, quote):
+    """
+    CleanComments for lines with bracket arguments or bracket comments,
+    going from one significant character to the next
+    """
     prior = []
-    prev = ''
-    for char in line:
-        try:
-            if char == '"':
-                if prev != '\\':
-                    quote = not quote
-                    prior.append(char)
-                continue
-            elif char == '#' and not quote:
+    pos = 0
+    while True:
+        if quote is True:
+            end = _RE_CLEAN_QUOTE_END.match(line, pos)
+            if end is None:
                 break
-            if not quote:
-                prior.append(char)
-        finally:
-            prev = char
-
-    # rstrip removes trailing space between end of command and the comment # start
-
+            prior.append('"')
+            pos = end.end()
+            quote = False
+        elif quote:
+            closing = quote.lstrip('#')
+            end = line.find(closing, pos)
+            if end == -1:
+                break
+            if not quote.startswith('#'):
+                prior.append(closing)
+            pos = end + len(closing)
+            quote = False
+        else:
+            match = _RE_CLEAN_SIGNIFICANT.search(line, pos)
+            if match is None:
+                prior.append(line[pos:])
+                break
+            start = match.start()
+            token = match.group()
+            if token == '"':
+                backslashes = start
+                while backslashes > pos and line[backslashes - 1] == '\\':
+                    backslashes -= 1
+                if (start - backslashes) % 2:
+                    # an escaped quote is dropped
+                    prior.append(line[pos:start])
+                else:
+                    prior.append(line[pos:start + 1])
+                    quote = True
+                pos = start + 1
+            elif token == '#':
+                prior.append(line[pos:start])
+                bracket = _RE_CLEAN_BRACKET_COMMENT.match(line, start)
+                if bracket is None:
+                    break
+                quote = '#]' + bracket.group(1) + ']'
+                pos = bracket.end()
+            else:
+                prior.append(line[pos:match.end()])
+                quote = ']' + token[1:-1] + ']'
+                pos = match.end()
     return ''.join(prior).rstrip(), quote
 
+class _BlockIndex(object):
+    """
+    The if(), foreach(), while(), function() and macro() blocks in a file,
+    found in one pass over the commands that start each line
+    """
+    def __init__(self, lines):
+        # the lower case command starting each line, or ''
+        self.commands = [GetCommand(line).lower() for line in lines]
+        # how many blocks each line is inside. The commands that end or
+        # continue a block count as outside it.
+        self.depths = [0] * len(lines)
+        # whether each line is a block command with no match. Openers are
+        # matched by their closer, and closers and else() commands by their
+        # opener.
+        self.unmatched = [False] * len(lines)
+        # distance from each line back to the opener of the innermost block
+        # open before it, or None. Update starts again from these after an
+        # edit, and distances keep most of them right when lines are added
+        # or removed.
+        self.openers = [None] * len(lines)
+        self._Index(0, None, len(lines), 0)
+
+    def _Stack(self, top):
+        """
+        Return the openers of the blocks open around the opener top, ending
+        with top
+        """
+        stack = []
+        while top is not None:
+            stack.append(top)
+            distance = self.openers[top]
+            top = None if distance is None else top - distance
+        stack.reverse()
+        return stack
+
+    def _Index(self, start, top, resume, shift):
+        """
+        Work out the blocks of the lines from start on, given the innermost
+        block open before it. From line resume on, the work stops at the
+        first line that has the same blocks open as before an edit that
+        added shift lines, as nothing after it changes. Returns the line it
+        stopped at.
+        """
+        commands = self.commands
+        depths = self.depths
+        unmatched = self.unmatched
+        openers = self.openers
+        stack = self._Stack(top)
+        # positions in the stack of the open blocks of each kind
+        open_blocks = dict((command, []) for command in _BLOCK_OPENERS)
+        for position, opener in enumerate(stack):
+            open_blocks[commands[opener]].append(position)
+        for linenumber in range(start, len(commands)):
+            if linenumber >= resume:
+                distance = openers[linenumber]
+                if distance is None:
+                    if not stack:
+                        return linenumber
+                elif (shift == 0 and stack and stack[-1] < start and
+                      stack[-1] == linenumber - distance):
+                    return linenumber
+            openers[linenumber] = linenumber - stack[-1] if stack else None
+            command = commands[linenumber]
+            if command in _BLOCK_OPENERS:
+                depths[linenumber] = len(stack)
+                unmatched[linenumber] = False
+                open_blocks[command].append(len(stack))
+                stack.append(linenumber)
+            elif command in _BLOCK_MIDDLES:
+                if stack and commands[stack[-1]] == _BLOCK_MIDDLES[command]:
+                    depths[linenumber] = len(stack) - 1
+                    unmatched[linenumber] = False
+                else:
+                    depths[linenumber] = len(stack)
+                    unmatched[linenumber] = True
+            elif command in _BLOCK_CLOSERS:
+                positions = open_blocks[_BLOCK_CLOSERS[command]]
+                if positions:
+                    # blocks opened inside this one are never closed
+                    while len(stack) > positions[-1] + 1:
+                        inner = stack.pop()
+                        open_blocks[commands[inner]].pop()
+                        unmatched[inner] = True
+                    positions.pop()
+                    unmatched[stack.pop()] = False
+                    unmatched[linenumber] = False
+                else:
+                    unmatched[linenumber] = True
+                depths[linenumber] = len(stack)
+            else:
+                depths[linenumber] = len(stack)
+                unmatched[linenumber] = False
+        for opener in stack:
+            unmatched[opener] = True
+        return len(commands)
+
+    def Update(self, start, end, lines):
+        """
+        Replace the commands of the lines from start up to end with those of
+        lines, and work out the blocks again from start on. Returns the lines
+        outside the edit whose depth changed, or that were matched and are
+        not any more or the other way round.
+        """
+        count = len(lines)
+        shift = count - (end - start)
+        stop = start + count
+        distance = self.openers[start]
+        top = None if distance is None else start - distance
+        old_depths = self.depths
+        old_unmatched = self.unmatched
+        self.commands[start:end] = [GetCommand(line).lower() for line in lines]
+        self.depths = old_depths[:start] + [0] * count + old_depths[end:]
+        self.unmatched = old_unmatched[:start] + [False] * count + old_unmatched[end:]
+        self.openers[start:end] = [None] * count
+        last = self._Index(start, top, stop, shift)
+        depths = self.depths
+        unmatched = self.unmatched
+        # blocks open before the edit may now be closed by another line
+        changed = [opener for opener in self._Stack(top)
+                   if unmatched[opener] != old_unmatched[opener]]
+        for linenumber in range(stop, last):
+            old = linenumber - shift
+            if (depths[linenumber] != old_depths[old] or
+                    unmatched[linenumber] != old_unmatched[old]):
+                changed.append(linenumber)
+        return changed
+
 class CleansedLines(object):
     def __init__(self, lines):
         self.have_seen_uppercase = None
         self.raw_lines = lines
         self.lines = []
+        # the CleanComments state at the start of each line
+        self._quotes = []
+        # distance from each line to the next one that closes a command
+        self._command_ends = None
+        self._blocks = None
         quote = False
         for line in lines:
+            self._quotes.append(quote)
             cleaned, quote = CleanComments(line, quote)
             self.lines.append(cleaned)
 
     def LineNumbers(self):
         return range(0, len(self.lines))
 
+    def GetBlocks(self):
+        """
+        Return the _BlockIndex for the lines, found the first time it is
+        needed
+        """
+        if self._blocks is None:
+            self._blocks = _BlockIndex(self.lines)
+        return self._blocks
+
+    def GetCommandEnd(self, linenumber):
+        """
+        Return the first line at or after linenumber that closes a command,
+        or None if there is no such line. The answers for all lines are
+        worked out in one pass the first time this is called.
+        """
+        if self._command_ends is None:
+            self._command_ends = [None] * len(self.lines)
+            self._UpdateCommandEnds(0, len(self.lines))
+        distance = self._command_ends[linenumber]
+        if distance is None:
+            return None
+        return linenumber + distance
+
+    def _UpdateCommandEnds(self, start, stop):
+        """
+        Work out the command ends again after lines start to stop changed.
+        Distances are stored rather than line numbers so that the lines after
+        an edit do not need updating when lines are added or removed.
+        """
+        ends = self._command_ends
+        following = None
+        if stop < len(ends):
+            following = ends[stop]
+        for i in range(stop - 1, -1, -1):
+            if ')' in self.lines[i]:
+                distance = 0
+            elif following is None:
+                distance = None
+            else:
+                distance = following + 1
+            if i < start and ends[i] == distance:
+                break
+            ends[i] = distance
+            following = distance
+
+    def Replace(self, start, end, lines):
+        """
+        Replace the raw lines from start up to end with lines. Following
+        lines are cleaned again if they now start in a different quote or
+        bracket state. Returns the index after the last line whose cleaned
+        text may have changed, and the lines after or before that whose
+        blocks changed, if the blocks have been found.
+        """
+        quote = self._quotes[start]
+        cleaned_lines = []
+        quotes = []
+        for line in lines:
+            quotes.append(quote)
+            cleaned, quote = CleanComments(line, quote)
+            cleaned_lines.append(cleaned)
+        self.raw_lines[start:end] = lines
+        self.lines[start:end] = cleaned_lines
+        self._quotes[start:end] = quotes
+        stop = start + len(lines)
+        while stop < len(self.lines) and self._quotes[stop] != quote:
+            self._quotes[stop] = quote
+            self.lines[stop], quote = CleanComments(self.raw_lines[stop], quote)
+            stop += 1
+        if self._command_ends is not None:
+            self._command_ends[start:end] = [None] * len(lines)
+            self._UpdateCommandEnds(start, stop)
+        moved = []
+        if self._blocks is not None:
+            shift = len(lines) - (end - start)
+            moved = self._blocks.Update(start, stop - shift, self.lines[start:stop])
+        return stop, moved
+
 def ShouldPrintError(category):
-    should_print = True
-    for f in _lint_state.filters:
-        if f.startswith('-') and category.startswith(f[1:]):
-            should_print = False
-        elif f.startswith('+') and category.startswith(f[1:]):
-            should_print = True
-    return should_print
+    return _lint_state.ShouldPrint(category)
 
 def Error(filename, linenumber, category, message):
     if ShouldPrintError(category):
-        _lint_state.errors += 1
-        print('%s:%d: %s [%s]' % (filename, linenumber, message, category))
+        EmitError(filename, linenumber, category, message)
+
+def EmitError(filename, linenumber, category, message):
+    """
+    Report an error that has already been checked against the filters
+    """
+    _lint_state.errors += 1
+    _lint_metrics.AddError(category)
+    _lint_state.reporter.Error(filename, linenumber, category, message)
+
+class _ErrorRecorder(object):
+    """
+    Reports errors in the same way as Error, keeping a copy of those that
+    got past the filters so that they can be replayed later
+    """
+    def __init__(self):
+        self.errors = []
+
+    def __call__(self, filename, linenumber, category, message):
+        if ShouldPrintError(category):
+            self.errors.append((linenumber, category, message))
+            EmitError(filename, linenumber, category, message)
 
 def CheckLineLength(filename, linenumber, clean_lines, errors):
     """
@@ -301,16 +1109,21 @@ def CheckUpperLowerCase(filename, linenumber, clean_lines, errors):
                     linenumber,
                     'readability/wonkycase',
                     'Do not use mixed case commands')
-        if clean_lines.have_seen_uppercase is None:
-            clean_lines.have_seen_uppercase = IsCommandUpperCase(command)
-        else:
-            is_upper = IsCommandUpperCase(command)
-            if is_upper != clean_lines.have_seen_uppercase:
-                return errors(
-                        filename,
-                        linenumber,
-                        'readability/mixedcase',
-                        'Do not mix upper and lower case commands')
+        CheckCaseConvention(filename, linenumber, clean_lines,
+                            IsCommandUpperCase(command), errors)
+
+def CheckCaseConvention(filename, linenumber, clean_lines, is_upper, errors):
+    """
+    Check that a command has the same case as the first one in the file
+    """
+    if clean_lines.have_seen_uppercase is None:
+        clean_lines.have_seen_uppercase = is_upper
+    elif is_upper != clean_lines.have_seen_uppercase:
+        return errors(
+                filename,
+                linenumber,
+                'readability/mixedcase',
+                'Do not mix upper and lower case commands')
 
 def GetInitialSpaces(line):
     initial_spaces = 0
@@ -318,58 +1131,84 @@ def GetInitialSpaces(line):
         initial_spaces += 1
     return initial_spaces
 
+def GetSpacesBeforeEnd(line):
+    """
+    Return the amount of white space before the first ) in line
+    """
+    end = line.find(')')
+    start = end
+    while start > 0 and line[start - 1] in ' \t\r\n\f\v':
+        start -= 1
+    return end - start
+
 def CheckCommandSpaces(filename, linenumber, clean_lines, errors):
     """
-    No extra spaces between command and parenthesis
+    No extra spaces between command and parenthesis, and the same spaces
+    inside either end of the ()
     """
-    line = clean_lines.lines[linenumber]
-    match = ContainsCommand(line)
+    if CheckExtraSpaces(filename, linenumber, clean_lines, errors):
+        CheckMatchingSpaces(filename, linenumber, clean_lines, errors)
+
+def CheckExtraSpaces(filename, linenumber, clean_lines, errors):
+    """
+    No extra spaces between command and parenthesis. Returns whether the
+    line starts a command.
+    """
+    match = ContainsCommand(clean_lines.lines[linenumber])
     if match and len(match.group(2)):
         errors(filename, linenumber, 'whitespace/extra',
                 "Extra spaces between '%s' and its ()"%(match.group(1)))
-    if match:
-        spaces_after_open = len(_RE_COMMAND_START_SPACES.match(line).group(1))
+    return match is not None
+
+def CheckMatchingSpaces(filename, linenumber, clean_lines, errors):
+    """
+    The spaces after the ( of the command on this line should match those
+    before its )
+    """
+    line = clean_lines.lines[linenumber]
+    spaces_after_open = len(_RE_COMMAND_START_SPACES.match(line).group(1))
+    initial_linenumber = linenumber
+    linenumber = clean_lines.GetCommandEnd(initial_linenumber)
+    if linenumber is None:
+        errors(filename, initial_linenumber, 'syntax',
+                'Unable to find the end of this command')
+    else:
+        line = clean_lines.lines[linenumber]
+        spaces_before_end = GetSpacesBeforeEnd(line)
         initial_spaces = GetInitialSpaces(line)
-        initial_linenumber = linenumber
-        end = None
-        while True:
-            line = clean_lines.lines[linenumber]
-            end = _RE_COMMAND_END_SPACES.search(line)
-            if end:
-                break
-            linenumber += 1
-            if linenumber >= len(clean_lines.lines):
-                break
-        if linenumber == len(clean_lines.lines) and not end:
-            errors(filename, initial_linenumber, 'syntax',
-                    'Unable to find the end of this command')
-        if end:
-            spaces_before_end = len(end.group(1))
-            initial_spaces = GetInitialSpaces(line)
-            if initial_linenumber != linenumber and spaces_before_end >= initial_spaces:
-                spaces_before_end -= initial_spaces
-
-            if spaces_after_open != spaces_before_end:
-                errors(filename, initial_linenumber, 'whitespace/mismatch',
-                        'Mismatching spaces inside () after command')
+        if initial_linenumber != linenumber and spaces_before_end >= initial_spaces:
+            spaces_before_end -= initial_spaces
+
+        if spaces_after_open != spaces_before_end:
+            errors(filename, initial_linenumber, 'whitespace/mismatch',
+                    'Mismatching spaces inside () after command')
 
 def CheckRepeatLogic(filename, linenumber, clean_lines, errors):
     """
     Check for logic inside else, endif etc
     """
     line = clean_lines.lines[linenumber]
-    for cmd in _logic_commands:
-        if re.search(r'\b%s\b'%cmd, line.lower()):
-            m = _RE_LOGIC_CHECK.search(line)
-            if m:
-                errors(filename, linenumber, 'readability/logic',
-                        'Expression repeated inside %s; '
-                        'better to use only %s()'%(cmd, m.group(1)))
-            break
+    cmd = GetCommand(line).lower()
+    if cmd in _logic_commands:
+        # a match has to end with a ), so there is no point looking
+        # beyond the last one
+        m = _RE_LOGIC_CHECK.search(line[:line.rfind(')') + 1])
+        if m:
+            errors(filename, linenumber, 'readability/logic',
+                    'Expression repeated inside %s; '
+                    'better to use only %s()'%(cmd, m.group(1)))
 
 def CheckIndent(filename, linenumber, clean_lines, errors):
     line = clean_lines.raw_lines[linenumber]
     initial_spaces = GetInitialSpaces(line)
+    if _lint_state.block_indent:
+        blocks = clean_lines.GetBlocks()
+        if blocks.commands[linenumber]:
+            expected = blocks.depths[linenumber] * _lint_state.spaces
+            if initial_spaces != expected:
+                errors(filename, linenumber, 'whitespace/indent',
+                        'Weird indentation; expected %d spaces'%(expected))
+            return
     remainder = initial_spaces % _lint_state.spaces
     if remainder != 0:
         errors(filename, linenumber, 'whitespace/indent',
@@ -384,6 +1223,13 @@ def CheckStyle(filename, linenumber, clean_lines, errors):
     """
     CheckIndent(filename, linenumber, clean_lines, errors)
     CheckCommandSpaces(filename, linenumber, clean_lines, errors)
+    CheckWhitespace(filename, linenumber, clean_lines, errors)
+    CheckRepeatLogic(filename, linenumber, clean_lines, errors)
+
+def CheckWhitespace(filename, linenumber, clean_lines, errors):
+    """
+    Check for tabs and trailing white space
+    """
     line = clean_lines.raw_lines[linenumber]
     if line.find('\t') != -1:
         errors(filename, linenumber, 'whitespace/tabs', 'Tab found; please use spaces')
@@ -391,10 +1237,26 @@ def CheckStyle(filename, linenumber, clean_lines, errors):
     if line and line[-1].isspace():
         errors(filename, linenumber, 'whitespace/eol', 'Line ends in whitespace')
 
-    CheckRepeatLogic(filename, linenumber, clean_lines, errors)
+def CheckBlocks(filename, linenumber, clean_lines, errors):
+    """
+    Check that if(), foreach(), while(), function() and macro() blocks are
+    closed, and that nothing closes a block that is not open
+    """
+    blocks = clean_lines.GetBlocks()
+    if not blocks.unmatched[linenumber]:
+        return
+    cmd = blocks.commands[linenumber]
+    if cmd in _BLOCK_OPENERS:
+        errors(filename, linenumber, 'syntax',
+                'Unable to find the %s() for this %s()'%(_BLOCK_OPENERS[cmd], cmd))
+    else:
+        opener = _BLOCK_CLOSERS.get(cmd) or _BLOCK_MIDDLES[cmd]
+        errors(filename, linenumber, 'syntax',
+                'Unable to find the %s() for this %s()'%(opener, cmd))
 
 def CheckFileName(filename, errors):
-    name_match = re.match('Find(.*)\.cmake', os.path.basename(filename))
+    name = GetMemberName(filename)
+    name_match = re.match('Find(.*)\.cmake', os.path.basename(name))
     if name_match:
         package = name_match.group(1)
         if not package.isupper():
@@ -402,24 +1264,37 @@ def CheckFileName(filename, errors):
                     'Find modules should use uppercase names; '
                     'consider using Find' + package.upper() + '.cmake')
     else:
-        if filename.lower() == 'cmakelists.txt' and filename != 'CMakeLists.txt':
+        if name.lower() == 'cmakelists.txt' and name != 'CMakeLists.txt':
             errors(filename, 0, 'convention/filename',
                     'File should be called CMakeLists.txt')
 
+def GetMemberName(filename):
+    """
+    The path of a file inside the archive it was read from, for names such
+    as archive.tar.gz!dir/CMakeLists.txt, otherwise the filename itself
+    """
+    return filename.rpartition('!')[2]
+
 def IsFindPackage(filename):
+    filename = GetMemberName(filename)
     return os.path.basename(filename).startswith('Find') and filename.endswith('.cmake')
 
 def GetCommandArgument(linenumber, clean_lines):
     line = clean_lines.lines[linenumber]
     skip = GetCommand(line)
-    while True:
+    # Only look as far as the end of the command. If the command is never
+    # closed only look at its first line, as searching to the end of the
+    # file for each such command is quadratic.
+    end = clean_lines.GetCommandEnd(linenumber)
+    if end is None:
+        end = linenumber
+    for linenumber in range(linenumber, end + 1):
         line = clean_lines.lines[linenumber]
         m = _RE_COMMAND_ARG.finditer(line)
         for i in m:
             if i.group(1) == skip:
                 continue
             return i.group(1)
-        linenumber += 1
     return ''
 
 def CheckFindPackage(filename, linenumber, clean_lines, errors):
@@ -432,6 +1307,56 @@ def CheckFindPackage(filename, linenumber, clean_lines, errors):
             var_name = GetCommandArgument(linenumber, clean_lines)
             _package_state.HaveUsedStandardArgs(filename, linenumber, var_name, errors)
 
+def GetLineResult(filename, raw_line, line):
+    """
+    Run the checks that only look at the line itself, keeping the errors
+    for _LineResultCache
+    """
+    single = _CleansedLine(raw_line, line)
+    found = []
+    def Record(filename, linenumber, category, message):
+        found.append((category, message))
+    CheckLineLength(filename, 0, single, Record)
+    CheckUpperLowerCase(filename, 0, single, Record)
+    head = len(found)
+    if not _lint_state.block_indent:
+        CheckIndent(filename, 0, single, Record)
+    indent = len(found)
+    check_end = False
+    if CheckExtraSpaces(filename, 0, single, Record):
+        if single.GetCommandEnd(0) is None:
+            # the spaces before the ) are checked when the line is linted
+            check_end = True
+        else:
+            CheckMatchingSpaces(filename, 0, single, Record)
+    middle = len(found)
+    CheckWhitespace(filename, 0, single, Record)
+    CheckRepeatLogic(filename, 0, single, Record)
+    return _LineResult(found[:head], single.have_seen_uppercase, found[head:indent],
+                       found[indent:middle], check_end, found[middle:])
+
+def CheckLineCached(filename, linenumber, clean_lines, errors):
+    """
+    The same as the line length, case and style checks, taking the results
+    that only depend on the line from the cache
+    """
+    result = _line_cache.Get(filename, clean_lines.raw_lines[linenumber],
+                             clean_lines.lines[linenumber])
+    for category, message in result.head:
+        errors(filename, linenumber, category, message)
+    if result.is_upper is not None:
+        CheckCaseConvention(filename, linenumber, clean_lines, result.is_upper, errors)
+    if _lint_state.block_indent:
+        CheckIndent(filename, linenumber, clean_lines, errors)
+    for category, message in result.indent:
+        errors(filename, linenumber, category, message)
+    for category, message in result.middle:
+        errors(filename, linenumber, category, message)
+    if result.check_end:
+        CheckMatchingSpaces(filename, linenumber, clean_lines, errors)
+    for category, message in result.tail:
+        errors(filename, linenumber, category, message)
+
 def ProcessLine(filename, linenumber, clean_lines, errors):
     """
     Arguments:
@@ -441,29 +1366,40 @@ def ProcessLine(filename, linenumber, clean_lines, errors):
       errors      the error handling function
     """
     CheckLintPragma(filename, linenumber, clean_lines.raw_lines[linenumber], errors)
-    CheckLineLength(filename, linenumber, clean_lines, errors)
-    CheckUpperLowerCase(filename, linenumber, clean_lines, errors)
-    CheckStyle(filename, linenumber, clean_lines, errors)
+    if _line_cache.size:
+        CheckLineCached(filename, linenumber, clean_lines, errors)
+    else:
+        CheckLineLength(filename, linenumber, clean_lines, errors)
+        CheckUpperLowerCase(filename, linenumber, clean_lines, errors)
+        CheckStyle(filename, linenumber, clean_lines, errors)
+    CheckBlocks(filename, linenumber, clean_lines, errors)
     if IsFindPackage(filename):
         CheckFindPackage(filename, linenumber, clean_lines, errors)
 
 def IsValidFile(filename):
+    filename = GetMemberName(filename)
     return filename.endswith('.cmake') or os.path.basename(filename).lower() == 'cmakelists.txt'
 
-def ProcessFile(filename):
+def ProcessFile(filename, contents=None):
+    """
+    Lint a file. If contents is given, it is a list of the lines in the
+    file and the file itself is not read.
+    """
     # Store and then restore the filters to prevent pragmas in the file from persisting.
     original_filters = list(_lint_state.filters)
     try:
-        return _ProcessFile(filename)
+        return _ProcessFile(filename, contents)
     finally:
         _lint_state.filters = original_filters
 
-def CheckLintPragma(filename, linenumber, line, errors=None):
+def CheckLintPragma(filename, linenumber, line, errors=None, state=None):
     # Check this line to see if it is a lint_cmake pragma
     linter_pragma_start = '# lint_cmake: '
+    if state is None:
+        state = _lint_state
     if line.startswith(linter_pragma_start):
         try:
-            _lint_state.SetFilters(line[len(linter_pragma_start):])
+            state.SetFilters(line[len(linter_pragma_start):])
         except ValueError as ex:
             if errors:
                 errors(filename, linenumber, 'syntax', str(ex))
@@ -471,15 +1407,240 @@ def CheckLintPragma(filename, linenumber, line, errors=None):
             print("Exception occurred while processing '{0}:{1}':"
                   .format(filename, linenumber))
 
-def _ProcessFile(filename):
+def ReadFile(filename):
+    with open(filename) as f:
+        return f.readlines()
+
+def IsGeneratedPath(filename):
+    path = '/' + filename.replace(os.sep, '/')
+    name = os.path.basename(filename)
+    for pattern in _lint_state.skip_patterns:
+        if fnmatch.fnmatchcase(path if '/' in pattern else name, pattern):
+            return True
+    return False
+
+def HasGeneratedBanner(head):
+    for banner in _lint_state.skip_banners:
+        if banner.search(head):
+            return True
+    return False
+
+def GetSkipReason(filename, size, head):
+    """
+    Return why a file should not be linted, either 'generated' or 'too
+    large', or None. head is the start of the file, which need be no
+    longer than _BANNER_SIZE. It may be a function returning the head,
+    which is only called if the path and size do not settle it.
+    """
+    if not _lint_state.include_generated and IsGeneratedPath(filename):
+        return 'generated'
+    if _lint_state.max_size and size > _lint_state.max_size:
+        return 'too large'
+    if not _lint_state.include_generated:
+        if callable(head):
+            head = head()
+        if HasGeneratedBanner(head):
+            return 'generated'
+    return None
+
+def GetContentsSkipReason(filename, contents):
+    """
+    GetSkipReason for a file that has already been read
+    """
+    def Head():
+        head = []
+        size = 0
+        for line in contents:
+            if size >= _BANNER_SIZE:
+                break
+            head.append(line)
+            size += len(line)
+        return ''.join(head)[:_BANNER_SIZE]
+    return GetSkipReason(filename, sum(len(line) for line in contents), Head)
+
+def ReadFileUnlessSkipped(filename):
+    """
+    Return (contents, reason). Files that are skipped, as given by
+    GetSkipReason, are not read past the banner, and their contents are
+    None.
+    """
+    with open(filename) as f:
+        reason = GetSkipReason(filename, os.fstat(f.fileno()).st_size,
+                               lambda: f.read(_BANNER_SIZE))
+        if reason is not None:
+            return None, reason
+        f.seek(0)
+        return f.readlines(), None
+
+def IsArchive(filename):
+    return IsTarArchive(filename) or filename.lower().endswith('.zip')
+
+def IsTarArchive(filename):
+    return filename.lower().endswith(_TAR_SUFFIXES)
+
+def DecodeLines(data):
+    """
+    Split file contents read as bytes into lines, decoded as ReadFile would
+    """
+    return io.TextIOWrapper(io.BytesIO(data), newline=None).readlines()
+
+def ReadArchive(filename):
+    """
+    Yield (name, contents) for each CMake file in a tar or zip archive,
+    without extracting it. Tar archives are streamed, so compressed archives
+    are only decompressed once.
+    """
+    if IsTarArchive(filename):
+        with tarfile.open(filename, 'r|*') as archive:
+            for member in archive:
+                if member.isfile() and IsValidFile(member.name):
+                    data = archive.extractfile(member).read()
+                    yield '%s!%s' % (filename, member.name), DecodeLines(data)
+        return
+    with zipfile.ZipFile(filename) as archive:
+        for info in archive.infolist():
+            if not info.filename.endswith('/') and IsValidFile(info.filename):
+                yield '%s!%s' % (filename, info.filename), DecodeLines(archive.read(info))
+
+class _ReadAheadSlot(object):
+    """
+    A file that has been queued for reading by the read-ahead threads
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.contents = None
+        self.error = None
+        self.done = threading.Event()
+
+    def Read(self):
+        try:
+            if IsArchive(self.filename):
+                self.contents = list(ReadArchive(self.filename))
+            elif IsValidFile(self.filename):
+                # skipped files are left for _ProcessFile to skip
+                self.contents = ReadFileUnlessSkipped(self.filename)[0]
+        except Exception as ex:
+            # raised again when the linting thread gets to this file
+            self.error = ex
+        finally:
+            self.done.set()
+
+def _ReadAheadWorker(slots):
+    while True:
+        slot = slots.get()
+        if slot is None:
+            return
+        slot.Read()
+
+def ReadAhead(filenames, depth):
+    """
+    Yield (filename, contents) for each file in order, while a pool of
+    threads reads up to depth files ahead of the one being linted
+    """
+    slots = queue.Queue()
+    workers = []
+    for _ in range(min(depth, _MAX_READ_THREADS)):
+        worker = threading.Thread(target=_ReadAheadWorker, args=(slots,))
+        worker.daemon = True
+        worker.start()
+        workers.append(worker)
+    pending = collections.deque()
+    filenames = iter(filenames)
+    try:
+        while True:
+            while len(pending) < depth:
+                filename = next(filenames, None)
+                if filename is None:
+                    break
+                slot = _ReadAheadSlot(filename)
+                pending.append(slot)
+                slots.put(slot)
+            if not pending:
+                return
+            slot = pending.popleft()
+            slot.done.wait()
+            if slot.error is not None:
+                raise slot.error
+            yield slot.filename, slot.contents
+    finally:
+        for _ in workers:
+            slots.put(None)
+
+def ReadFiles(filenames):
+    """
+    Yield (filename, contents) for each file. contents is None when the
+    file has not been read yet. For archives it is a list of the (name,
+    contents) of the CMake files inside.
+    """
+    if _lint_state.read_ahead > 0:
+        return ReadAhead(filenames, _lint_state.read_ahead)
+    return ((filename, None) for filename in filenames)
+
+class _CachedResult(object):
+    """
+    The outcome of linting some file contents, kept for --dedupe
+    """
+    def __init__(self, lines, filters, errors):
+        self.lines = lines
+        self.filters = filters
+        self.errors = errors
+
+def GetContentDigest(contents):
+    digest = hashlib.sha1()
+    for line in contents:
+        if not isinstance(line, bytes):
+            line = line.encode('utf-8', 'surrogatepass')
+        digest.update(line)
+    return digest.hexdigest()
+
+def GetContentKey(filename, contents):
+    """
+    Key for the results of linting contents. Files that share the key give
+    the same errors, apart from those from CheckFileName.
+    """
+    find_package = IsFindPackage(filename)
+    expected = None
+    if find_package:
+        expected = _package_state._GetExpected(filename)
+    return (GetContentDigest(contents), tuple(_lint_state.filters),
+            _lint_state.spaces, _lint_state.linelength, find_package, expected)
+
+def _ProcessFile(filename, contents=None):
     lines = ['# Lines start at 1']
     have_cr = False
+    _lint_metrics.files_seen += 1
     if not IsValidFile(filename):
-        print('Ignoring file: ' + filename)
+        _lint_metrics.files_skipped += 1
+        _lint_state.reporter.Ignore(filename)
         return
     global _package_state
     _package_state = _CMakePackageState()
-    for l in open(filename).readlines():
+    if contents is None:
+        contents, reason = ReadFileUnlessSkipped(filename)
+    else:
+        reason = GetContentsSkipReason(filename, contents)
+    if reason is not None:
+        if reason == 'generated':
+            _lint_metrics.files_generated += 1
+        else:
+            _lint_metrics.files_oversized += 1
+        _lint_state.skipped += 1
+        _lint_state.reporter.Skip(filename, reason)
+        return
+    content_key = None
+    if _lint_state.dedupe:
+        content_key = GetContentKey(filename, contents)
+        cached = _content_cache.get(content_key)
+        if cached is not None:
+            _lint_metrics.files_linted += 1
+            _lint_metrics.files_deduplicated += 1
+            _lint_metrics.lines += cached.lines
+            _lint_state.filters = list(cached.filters)
+            CheckFileName(filename, Error)
+            for linenumber, category, message in cached.errors:
+                EmitError(filename, linenumber, category, message)
+            return
+    for l in contents:
         l = l.rstrip('\n')
         if l.endswith('\r'):
             have_cr = True
@@ -487,15 +1648,223 @@ def _ProcessFile(filename):
         lines.append(l)
         CheckLintPragma(filename, len(lines) - 1, l)
     lines.append('# Lines end here')
+    _lint_metrics.files_linted += 1
+    _lint_metrics.lines += len(lines) - 2
+    if _lint_state.profiles:
+        ProcessProfiles(filename, lines, have_cr)
+        return
     # Check file name after reading lines incase of a # lint_cmake: pragma
     CheckFileName(filename, Error)
+    errors = Error
+    if content_key is not None:
+        filters = list(_lint_state.filters)
+        errors = _ErrorRecorder()
     if have_cr and os.linesep != '\r\n':
-        Error(filename, 0, 'whitespace/newline', 'Unexpected carriage return found; '
+        errors(filename, 0, 'whitespace/newline', 'Unexpected carriage return found; '
                 'better to use only \\n')
     clean_lines = CleansedLines(lines)
-    for line in clean_lines.LineNumbers():
-        ProcessLine(filename, line, clean_lines, Error)
-    _package_state.Done(filename, Error)
+    if _lint_state.split_jobs and len(lines) - 2 >= _lint_state.split_lines:
+        ProcessSplit(filename, clean_lines, errors)
+    else:
+        for line in clean_lines.LineNumbers():
+            ProcessLine(filename, line, clean_lines, errors)
+        _package_state.Done(filename, errors)
+    if content_key is not None:
+        _content_cache[content_key] = _CachedResult(len(lines) - 2, filters, errors.errors)
+
+def RunChecks(filename, clean_lines, spaces, linelength, block_indent):
+    """
+    Run the per line checks with the given settings, without filtering.
+    Returns a list of (linenumber, errors) for the lines with errors, and
+    the errors found once all the lines have been checked.
+    """
+    global _lint_state, _package_state
+    saved_state = _lint_state
+    _lint_state = _CMakeLintState()
+    _lint_state.spaces = spaces
+    _lint_state.linelength = linelength
+    _lint_state.block_indent = block_indent
+    _package_state = _CMakePackageState()
+    clean_lines.have_seen_uppercase = None
+    line_errors = []
+    done_errors = []
+    try:
+        for line in clean_lines.LineNumbers():
+            found = []
+            ProcessLine(filename, line, clean_lines,
+                        lambda *error: found.append(error))
+            if found:
+                line_errors.append((line, found))
+        _package_state.Done(filename, lambda *error: done_errors.append(error))
+    finally:
+        _lint_state = saved_state
+    return line_errors, done_errors
+
+def ReportProfile(name, profile, filename, lines, have_cr, results):
+    """
+    Report the errors in results that pass the filters of a profile. The
+    pragmas in the file are applied to the filters at the same points as
+    _ProcessFile applies them.
+    """
+    state = _CMakeLintState()
+    state.filters = list(profile.filters)
+    for i, line in enumerate(lines):
+        CheckLintPragma(filename, i, line, None, state)
+
+    def Report(filename, linenumber, category, message):
+        if state.ShouldPrint(category):
+            profile.errors += 1
+            _lint_state.errors += 1
+            _lint_metrics.AddError(category)
+            _lint_state.reporter.Error('[%s] %s' % (name, filename), linenumber,
+                                       category, message)
+
+    CheckFileName(filename, Report)
+    if have_cr and os.linesep != '\r\n':
+        Report(filename, 0, 'whitespace/newline', 'Unexpected carriage return found; '
+               'better to use only \\n')
+    ReplayErrors(filename, lines, results, state, Report)
+
+def ReplayErrors(filename, lines, results, state, report):
+    """
+    Pass the errors in results from RunChecks to report in the order they
+    were found, applying the pragma on each line to the filters of state
+    before the errors of that line, as ProcessLine does
+    """
+    line_errors, done_errors = results
+    pragmas = collections.deque(i for i, line in enumerate(lines)
+                                if line.startswith('# lint_cmake: '))
+    for line, found in line_errors:
+        while pragmas and pragmas[0] <= line:
+            i = pragmas.popleft()
+            CheckLintPragma(filename, i, lines[i], None, state)
+        for error in found:
+            report(*error)
+    for i in pragmas:
+        CheckLintPragma(filename, i, lines[i], None, state)
+    for error in done_errors:
+        report(*error)
+
+def ProcessProfiles(filename, lines, have_cr):
+    """
+    Lint the lines once for each distinct spaces, line length and block
+    indent setting of the --profile-config profiles, then report the errors of each
+    profile through its own filters
+    """
+    clean_lines = CleansedLines(lines)
+    results = {}
+    for name, profile in _lint_state.profiles:
+        settings = (profile.spaces, profile.linelength, profile.block_indent)
+        if settings not in results:
+            results[settings] = RunChecks(filename, clean_lines, *settings)
+        ReportProfile(name, profile, filename, lines, have_cr, results[settings])
+
+def FindCaseConvention(lines):
+    """
+    Whether the first command in lines that is not in mixed case is upper
+    case, or None if there is no such command. CheckCaseConvention holds the
+    other commands to this.
+    """
+    for line in lines:
+        command = GetCommand(line)
+        if command and not IsCommandMixedCase(command):
+            return IsCommandUpperCase(command)
+    return None
+
+def SplitLines(lines, size):
+    """
+    Split the cleaned lines into (start, stop) chunks of at least size
+    lines. Each chunk starts where no command is open, so that the lines of
+    a command spread over several lines are always in the same chunk.
+    Quoted and bracket arguments have already been removed from the lines,
+    so only the brackets of commands are counted.
+    """
+    chunks = []
+    start = 0
+    depth = 0
+    for linenumber, line in enumerate(lines):
+        if depth == 0 and linenumber - start >= size:
+            chunks.append((start, linenumber))
+            start = linenumber
+        if '(' in line or ')' in line:
+            depth = max(0, depth + line.count('(') - line.count(')'))
+    chunks.append((start, len(lines)))
+    return chunks
+
+# the (filename, clean_lines) being linted by a --split-jobs worker
+_split_file = None
+
+def _InitSplitWorker(filename, clean_lines, settings):
+    global _lint_state, _lint_metrics, _line_cache, _split_file
+    _lint_state = _CMakeLintState()
+    (_lint_state.spaces, _lint_state.linelength, _lint_state.block_indent,
+     line_cache_size) = settings
+    _lint_metrics = _CMakeLintMetrics()
+    _line_cache = _LineResultCache(line_cache_size)
+    _split_file = (filename, clean_lines)
+
+def _LintChunk(chunk):
+    """
+    Run the per line checks on a chunk of the file in a worker, without
+    filtering. Returns the errors of each line as RunChecks does, what
+    CheckFindPackage found out, and the line cache hits and misses.
+    """
+    global _package_state
+    filename, clean_lines = _split_file
+    start, stop = chunk
+    _package_state = _CMakePackageState()
+    hits = _lint_metrics.line_cache_hits
+    misses = _lint_metrics.line_cache_misses
+    line_errors = []
+    for line in range(start, stop):
+        found = []
+        ProcessLine(filename, line, clean_lines,
+                    lambda *error: found.append(error))
+        if found:
+            line_errors.append((line, found))
+    return (line_errors, _package_state.have_included_stdargs,
+            _package_state.have_used_stdargs,
+            _lint_metrics.line_cache_hits - hits,
+            _lint_metrics.line_cache_misses - misses)
+
+def ProcessSplit(filename, clean_lines, errors):
+    """
+    Run the per line checks on a large file in --split-jobs worker
+    processes, each taking chunks of the lines. The errors are reported in
+    the same order and through the same filters as the ProcessLine loop in
+    _ProcessFile would report them.
+    """
+    # The state that the checks build up over the file is worked out here,
+    # so that each chunk can be checked on its own
+    clean_lines.have_seen_uppercase = FindCaseConvention(clean_lines.lines)
+    clean_lines.GetCommandEnd(0)
+    clean_lines.GetBlocks()
+    jobs = _lint_state.split_jobs
+    size = -(-len(clean_lines.lines) // (jobs * _SPLIT_CHUNKS_PER_JOB))
+    settings = (_lint_state.spaces, _lint_state.linelength, _lint_state.block_indent,
+                _line_cache.size)
+    pool = multiprocessing.Pool(jobs, _InitSplitWorker, (filename, clean_lines, settings))
+    try:
+        results = pool.map(_LintChunk, SplitLines(clean_lines.lines, size))
+        # let the workers exit by themselves, so that their CPU time is
+        # counted once they are joined
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    line_errors = []
+    for chunk_errors, have_included, have_used, hits, misses in results:
+        line_errors.extend(chunk_errors)
+        _package_state.have_included_stdargs |= have_included
+        _package_state.have_used_stdargs |= have_used
+        _lint_metrics.line_cache_hits += hits
+        _lint_metrics.line_cache_misses += misses
+    done_errors = []
+    _package_state.Done(filename, lambda *error: done_errors.append(error))
+    ReplayErrors(filename, clean_lines.raw_lines, (line_errors, done_errors), _lint_state,
+                 errors)
 
 def PrintVersion():
     sys.stderr.write("cmakelint %s\n" % cmakelint.__version__.VERSION)
@@ -511,7 +1880,9 @@ def PrintCategories():
     sys.stderr.write(_ERROR_CATEGORIES)
     sys.exit(0)
 
-def ParseOptionFile(contents, ignore_space):
+def ParseOptionFile(contents, ignore_space, state=None):
+    if state is None:
+        state = _lint_state
     filters = None
     spaces = None
     linelength = None
@@ -524,14 +1895,22 @@ def ParseOptionFile(contents, ignore_space):
         if line.startswith('spaces='):
             spaces = line.replace('spaces=', '')
         if line == 'quiet':
-            _lint_state.SetQuiet(True)
+            state.SetQuiet(True)
+        if line == 'block-indent':
+            state.block_indent = True
+        if line.startswith('skip='):
+            state.AddSkipPatterns(line.replace('skip=', '', 1))
+        if line.startswith('skip-banner='):
+            state.AddSkipBanner(line.replace('skip-banner=', '', 1))
+        if line.startswith('max-size='):
+            state.SetMaxSize(line.replace('max-size=', '', 1))
         if line.startswith('linelength='):
             linelength = line.replace('linelength=', '')
-    _lint_state.SetFilters(filters)
+    state.SetFilters(filters)
     if spaces and not ignore_space:
-        _lint_state.SetSpaces(spaces)
+        state.SetSpaces(spaces)
     if linelength is not None:
-        _lint_state.SetLineLength(linelength)
+        state.SetLineLength(linelength)
 
 
 # See https://stackoverflow.com/a/30299145 - fixes deprecation warning in py 3.4+
@@ -542,11 +1921,31 @@ else:
     def OpenTextFile(filename):
         return open(filename, 'r', newline=None)
 
+def ReadProfile(filename, filters, ignore_space):
+    """
+    Return the lint state for a --profile-config file
+    """
+    state = _CMakeLintState()
+    state.spaces = _lint_state.spaces
+    state.linelength = _lint_state.linelength
+    state.block_indent = _lint_state.block_indent
+    try:
+        with OpenTextFile(filename) as config:
+            ParseOptionFile(config.readlines(), ignore_space, state)
+    except IOError as ex:
+        raise ValueError('Unable to read profile config %s: %s' % (filename, ex))
+    state.SetFilters(filters)
+    return state
+
 def ParseArgs(argv):
     try:
         (opts, filenames) = getopt.getopt(argv, '',
                 ['help', 'filter=', 'config=', 'spaces=', 'linelength=',
-                 'quiet', 'version'])
+                 'quiet', 'version', 'metrics-file=', 'files-from=', 'null',
+                 'stdin-filename=', 'read-ahead=', 'dedupe', 'shard=',
+                 'shard-output=', 'lsp', 'profile-config=', 'git-rev=',
+                 'line-cache=', 'block-indent', 'include-generated', 'max-size=',
+                 'store=', 'split-jobs=', 'split-lines='])
     except getopt.GetoptError:
         PrintUsage('Invalid Arguments')
     filters = ""
@@ -578,27 +1977,339 @@ def ParseArgs(argv):
                 _lint_state.SetLineLength(val)
             except:
                 PrintUsage('line length expects an integer value')
+        elif opt == '--metrics-file':
+            _lint_state.metrics_file = val
+        elif opt == '--files-from':
+            _lint_state.files_from = val
+        elif opt == '--null':
+            _lint_state.files_from_delimiter = '\0'
+        elif opt == '--stdin-filename':
+            _lint_state.stdin_filename = val
+        elif opt == '--read-ahead':
+            try:
+                _lint_state.SetReadAhead(val)
+            except ValueError:
+                PrintUsage('read ahead expects a non-negative integer value')
+        elif opt == '--dedupe':
+            _lint_state.dedupe = True
+        elif opt == '--shard':
+            try:
+                _lint_state.SetShard(val)
+            except ValueError:
+                PrintUsage('shard expects i/N with 1 <= i <= N')
+        elif opt == '--shard-output':
+            _lint_state.shard_output = val
+        elif opt == '--lsp':
+            _lint_state.lsp = True
+        elif opt == '--include-generated':
+            _lint_state.include_generated = True
+        elif opt == '--max-size':
+            try:
+                _lint_state.SetMaxSize(val)
+            except ValueError:
+                PrintUsage('max size expects a non-negative integer value')
+        elif opt == '--block-indent':
+            _lint_state.block_indent = True
+        elif opt == '--line-cache':
+            try:
+                _lint_state.SetLineCacheSize(val)
+            except ValueError:
+                PrintUsage('line cache expects a non-negative integer value')
+        elif opt == '--git-rev':
+            _lint_state.git_rev = val
+        elif opt == '--store':
+            _lint_state.store = val
+        elif opt == '--split-jobs':
+            try:
+                _lint_state.SetSplitJobs(val)
+            except ValueError:
+                PrintUsage('split jobs expects a non-negative integer value')
+        elif opt == '--split-lines':
+            try:
+                _lint_state.SetSplitLines(val)
+            except ValueError:
+                PrintUsage('split lines expects a positive integer value')
+        elif opt == '--profile-config':
+            try:
+                _lint_state.AddProfileConfig(val)
+            except ValueError as ex:
+                PrintUsage(str(ex))
     try:
+        # profiles start from the command line settings, not those of the
+        # usual config file
+        for name, profile_config in _lint_state.profile_configs:
+            _lint_state.profiles.append((name, ReadProfile(profile_config, filters, ignore_space)))
         if _lint_state.config:
             try:
-                ParseOptionFile(OpenTextFile(_lint_state.config).readlines(), ignore_space)
+                with OpenTextFile(_lint_state.config) as config:
+                    ParseOptionFile(config.readlines(), ignore_space)
             except IOError:
                 pass
         _lint_state.SetFilters(filters)
     except ValueError as ex:
         PrintUsage(str(ex))
 
-    if not filenames:
+    if _lint_state.files_from == '-' and _lint_state.stdin_filename:
+        PrintUsage('Cannot use --files-from=- with --stdin-filename')
+    if _lint_state.stdin_filename and (_lint_state.shard or _lint_state.shard_output):
+        PrintUsage('Cannot use --stdin-filename with --shard or --shard-output')
+    if _lint_state.profiles and (_lint_state.shard or _lint_state.shard_output or
+                                 _lint_state.dedupe or _lint_state.lsp):
+        PrintUsage('Cannot use --profile-config with --shard, --shard-output, '
+                   '--dedupe or --lsp')
+    if _lint_state.store and (_lint_state.profiles or _lint_state.lsp):
+        PrintUsage('Cannot use --store with --profile-config or --lsp')
+    if _lint_state.shard_output and not _lint_state.shard:
+        _lint_state.shard = (1, 1)
+    if _lint_state.lsp:
+        if filenames:
+            PrintUsage('Files can not be given with --lsp')
+        return filenames
+    if (not filenames and not _lint_state.files_from and not _lint_state.stdin_filename and
+            not _lint_state.git_rev):
         PrintUsage('No files were specified!')
     return filenames
 
+def ReadFileList(stream, delimiter='\n'):
+    """
+    Yield the file names in a file list one at a time, so that huge lists
+    are not held in memory
+    """
+    pending = ''
+    while True:
+        block = stream.read(64 * 1024)
+        if not block:
+            break
+        entries = (pending + block).split(delimiter)
+        pending = entries.pop()
+        for entry in entries:
+            if delimiter == '\n':
+                entry = entry.rstrip('\r')
+            if entry:
+                yield entry
+    if delimiter == '\n':
+        pending = pending.rstrip('\r')
+    if pending:
+        yield pending
+
+def GetFilesToLint(filenames):
+    """
+    Yield the files given on the command line followed by those in the
+    --files-from list
+    """
+    for filename in filenames:
+        yield filename
+    if not _lint_state.files_from:
+        return
+    if _lint_state.files_from == '-':
+        for filename in ReadFileList(sys.stdin, _lint_state.files_from_delimiter):
+            yield filename
+        return
+    with open(_lint_state.files_from) as file_list:
+        for filename in ReadFileList(file_list, _lint_state.files_from_delimiter):
+            yield filename
+
+class _GitCatFile(object):
+    """
+    A long running "git cat-file --batch" process that reads blobs from the
+    object store one at a time
+    """
+    def __init__(self):
+        self.process = subprocess.Popen(['git', 'cat-file', '--batch'],
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def Read(self, object_id):
+        self.process.stdin.write(object_id.encode('ascii') + b'\n')
+        self.process.stdin.flush()
+        header = self.process.stdout.readline().split()
+        if len(header) != 3:
+            raise IOError('Unable to read git object %s' % object_id)
+        data = self.process.stdout.read(int(header[2]))
+        # each object is followed by a newline
+        self.process.stdout.read(1)
+        return data
+
+    def Close(self):
+        self.process.stdin.close()
+        self.process.stdout.close()
+        self.process.wait()
+
+def ListGitFiles(rev, paths):
+    """
+    Return (path, object id) for each file in the tree of rev that passes
+    IsValidFile, limited to the given paths if there are any
+    """
+    process = subprocess.Popen(['git', 'ls-tree', '-r', '-z', '--full-tree', rev, '--'] + paths,
+                               stdout=subprocess.PIPE)
+    output = process.communicate()[0]
+    if process.returncode != 0:
+        PrintUsage('Unable to list the files in %s' % rev)
+    files = []
+    for entry in output.split(b'\0'):
+        if not entry:
+            continue
+        info, _, path = entry.partition(b'\t')
+        mode, kind, object_id = info.split()
+        path = path.decode('utf-8')
+        # symbolic links are stored as blobs too
+        if kind == b'blob' and mode != b'120000' and IsValidFile(path):
+            files.append((path, object_id.decode('ascii')))
+    return files
+
+def ReadGitBlobs(filenames, object_ids):
+    """
+    Yield (filename, contents) for each file, reading the blobs through one
+    git cat-file process
+    """
+    cat_file = _GitCatFile()
+    try:
+        for filename in filenames:
+            yield filename, DecodeLines(cat_file.Read(object_ids[filename]))
+    finally:
+        cat_file.Close()
+
+def IsInShard(filename, shard):
+    index, count = shard
+    # mask so that Python 2 and 3 agree on the hash
+    return (zlib.crc32(filename.encode('utf-8')) & 0xffffffff) % count == index - 1
+
+def SelectShard(filenames, shard, results=None):
+    """
+    Yield the files in the given shard. The position of each one in the
+    full list is passed on to the results, if any.
+    """
+    for index, filename in enumerate(filenames):
+        if IsInShard(filename, shard):
+            if results is not None:
+                results.indexes.append(index)
+            yield filename
+
+def ReadShardOutput(filename):
+    try:
+        with open(filename) as f:
+            return json.load(f)
+    except (IOError, ValueError) as ex:
+        PrintUsage('Unable to read shard output %s: %s' % (filename, ex))
+
+def Merge(argv):
+    """
+    Combine the --shard-output files of a sharded run, printing the errors
+    in the same order as a single run would
+    """
+    try:
+        (opts, filenames) = getopt.getopt(argv, '', ['quiet'])
+    except getopt.GetoptError:
+        PrintUsage('Invalid Arguments')
+    quiet = _lint_state.quiet
+    for (opt, val) in opts:
+        if opt == '--quiet':
+            quiet = True
+    if not filenames:
+        PrintUsage('No shard outputs were specified!')
+    results = [ReadShardOutput(filename) for filename in filenames]
+    # quiet from the config file or the command line of the shards
+    if any(result.get('quiet') for result in results):
+        quiet = True
+    counts = set(result['shard'][1] for result in results)
+    shards = sorted(result['shard'][0] for result in results)
+    if len(counts) != 1 or shards != list(range(1, counts.pop() + 1)):
+        PrintUsage('Shard outputs should be from each of the shards of one run')
+    reporter = _TextReporter()
+    errors = 0
+    skipped = 0
+    ordered = heapq.merge(*[[(f['index'], f['path'], f['ignored'], f['errors'], f.get('skipped'))
+                             for f in result['files']] for result in results])
+    for _, path, ignored, file_errors, skip_reason in ordered:
+        if ignored:
+            reporter.Ignore(path)
+        if skip_reason:
+            reporter.Skip(path, skip_reason)
+            skipped += 1
+        for linenumber, category, message in file_errors:
+            reporter.Error(path, linenumber, category, message)
+        errors += len(file_errors)
+    if errors > 0 or not quiet:
+        sys.stderr.write("Total Errors: %d\n" % errors)
+    PrintSkipped(skipped, quiet)
+    if errors > 0:
+        return 1
+    return 0
+
+def PrintSkipped(skipped, quiet):
+    if skipped > 0 and not quiet:
+        sys.stderr.write("Skipped Files: %d (generated or too large)\n" % skipped)
+
+def WriteMetrics(filename):
+    with open(filename, 'w') as metrics:
+        json.dump(_lint_metrics.Results(), metrics, indent=2, sort_keys=True)
+        metrics.write('\n')
+
 def main():
+    global _lint_metrics, _content_cache, _line_cache
+    if sys.argv[1:2] == ['merge']:
+        return Merge(sys.argv[2:])
+    if sys.argv[1:2] == ['query']:
+        import cmakelint.store
+        return cmakelint.store.Query(sys.argv[2:])
+    _lint_metrics = _CMakeLintMetrics()
+    _content_cache = {}
     files = ParseArgs(sys.argv[1:])
-
-    for filename in files:
-        ProcessFile(filename)
-    if _lint_state.errors > 0 or not _lint_state.quiet:
+    _line_cache = _LineResultCache(_lint_state.line_cache_size)
+    if _lint_state.lsp:
+        import cmakelint.lsp
+        return cmakelint.lsp.Serve()
+
+    shard_results = None
+    if _lint_state.shard_output:
+        shard_results = _ShardReporter()
+        _lint_state.reporter = shard_results
+    store = None
+    if _lint_state.store:
+        import cmakelint.store
+        store = cmakelint.store.StoreReporter(_lint_state.store, _lint_state.reporter,
+                                              sys.argv[1:])
+        _lint_state.reporter = store
+    files = GetFilesToLint(files)
+    object_ids = None
+    if _lint_state.git_rev:
+        git_files = ListGitFiles(_lint_state.git_rev, list(files))
+        object_ids = dict(git_files)
+        files = [filename for filename, _ in git_files]
+    if _lint_state.shard:
+        files = SelectShard(files, _lint_state.shard, shard_results)
+    if _lint_state.stdin_filename:
+        ProcessFile(_lint_state.stdin_filename, sys.stdin.readlines())
+    if object_ids is not None:
+        files = ReadGitBlobs(files, object_ids)
+    else:
+        files = ReadFiles(files)
+    for filename, contents in files:
+        if shard_results is not None:
+            shard_results.StartFile(filename)
+        if not IsArchive(filename):
+            ProcessFile(filename, contents)
+            continue
+        if contents is None:
+            contents = ReadArchive(filename)
+        for name, member_contents in contents:
+            if shard_results is not None:
+                shard_results.StartMember(name)
+            ProcessFile(name, member_contents)
+    if store is not None:
+        store.Finish(_lint_metrics.Results())
+    if _lint_state.metrics_file:
+        WriteMetrics(_lint_state.metrics_file)
+    if shard_results is not None:
+        # the total is printed when the shards are merged
+        shard_results.Write(_lint_state.shard_output, _lint_state.shard, _lint_state.quiet)
+    elif _lint_state.profiles:
+        for name, profile in _lint_state.profiles:
+            if profile.errors > 0 or not _lint_state.quiet:
+                sys.stderr.write("[%s] Total Errors: %d\n" % (name, profile.errors))
+    elif _lint_state.errors > 0 or not _lint_state.quiet:
         sys.stderr.write("Total Errors: %d\n" % _lint_state.errors)
+    if shard_results is None:
+        PrintSkipped(_lint_state.skipped, _lint_state.quiet)
     if _lint_state.errors > 0:
         return 1
     else:
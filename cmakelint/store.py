@@ -0,0 +1,200 @@
+"""
+Copyright 2009 Richard Quirk
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may not
+use this file except in compliance with the License. You may obtain a copy of
+the License at http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations under
+the License.
+
+The SQLite results store written by "cmakelint --store" and read by
+"cmakelint query".
+
+Each run adds a row to the runs table and a row to the diagnostics table for
+each error reported, all in one transaction. Queries are answered with SQL
+and printed as the rows come back, so large stores are never loaded whole.
+"""
+from __future__ import print_function
+import getopt
+import json
+import os
+import sqlite3
+import time
+
+import cmakelint.__version__
+import cmakelint.main as lint
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    wall_time REAL,
+    version TEXT NOT NULL,
+    arguments TEXT NOT NULL,
+    files INTEGER,
+    lines INTEGER,
+    errors INTEGER
+);
+CREATE TABLE IF NOT EXISTS diagnostics (
+    run INTEGER NOT NULL REFERENCES runs (id),
+    path TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS diagnostics_run ON diagnostics (run, category);
+CREATE INDEX IF NOT EXISTS diagnostics_path ON diagnostics (path, run);
+CREATE INDEX IF NOT EXISTS diagnostics_category ON diagnostics (category, run);
+"""
+# errors are inserted this many at a time
+_BATCH_SIZE = 1000
+
+class StoreReporter(object):
+    """
+    Passes errors on to another reporter, and adds them to the store as
+    part of a transaction that is committed by Finish
+    """
+    def __init__(self, filename, reporter, arguments):
+        self.reporter = reporter
+        # transactions are started and committed explicitly
+        self.connection = sqlite3.connect(filename, isolation_level=None)
+        self.connection.executescript(_SCHEMA)
+        self.connection.execute('BEGIN')
+        self.run = self.connection.execute(
+                'INSERT INTO runs (started, version, arguments) VALUES (?, ?, ?)',
+                (time.time(), cmakelint.__version__.VERSION, json.dumps(arguments))).lastrowid
+        self.pending = []
+
+    def Error(self, filename, linenumber, category, message):
+        self.reporter.Error(filename, linenumber, category, message)
+        self.pending.append((self.run, filename, linenumber, category, message))
+        if len(self.pending) >= _BATCH_SIZE:
+            self._Flush()
+
+    def Ignore(self, filename):
+        self.reporter.Ignore(filename)
+
+    def Skip(self, filename, reason):
+        self.reporter.Skip(filename, reason)
+
+    def _Flush(self):
+        self.connection.executemany(
+                'INSERT INTO diagnostics (run, path, line, category, message) '
+                'VALUES (?, ?, ?, ?, ?)', self.pending)
+        self.pending = []
+
+    def Finish(self, metrics):
+        """
+        Record the totals for the run and commit it
+        """
+        self._Flush()
+        self.connection.execute(
+                'UPDATE runs SET wall_time = ?, files = ?, lines = ?, errors = ? WHERE id = ?',
+                (metrics['wall_time'], metrics['files_linted'], metrics['lines'],
+                 metrics['errors'], self.run))
+        self.connection.execute('COMMIT')
+        self.connection.close()
+
+def _LatestRun(connection, before=None):
+    if before is None:
+        row = connection.execute('SELECT MAX(id) FROM runs').fetchone()
+    else:
+        row = connection.execute('SELECT MAX(id) FROM runs WHERE id < ?', (before,)).fetchone()
+    return row[0]
+
+def _Runs(connection, options):
+    rows = connection.execute(
+            'SELECT id, started, wall_time, files, lines, errors FROM runs '
+            'ORDER BY id LIMIT ?', (options['limit'],))
+    for run, started, wall_time, files, lines, errors in rows:
+        print('%d %s files=%s lines=%s errors=%s time=%s' % (
+                run, time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(started)),
+                files, lines, errors,
+                'unfinished' if wall_time is None else '%.2fs' % wall_time))
+
+def _Files(connection, options):
+    rows = connection.execute(
+            'SELECT path, COUNT(*) AS n FROM diagnostics WHERE run = ? '
+            'GROUP BY path ORDER BY n DESC, path LIMIT ?',
+            (options['run'], options['limit']))
+    for path, count in rows:
+        print('%6d %s' % (count, path))
+
+def _Categories(connection, options):
+    rows = connection.execute(
+            'SELECT category, COUNT(*) AS n FROM diagnostics WHERE run = ? '
+            'GROUP BY category ORDER BY n DESC, category LIMIT ?',
+            (options['run'], options['limit']))
+    for category, count in rows:
+        print('%6d %s' % (count, category))
+
+def _Errors(connection, options):
+    query = 'SELECT path, line, category, message FROM diagnostics WHERE run = ?'
+    arguments = [options['run']]
+    for column in ('path', 'category'):
+        if options[column] is not None:
+            query += ' AND %s = ?' % column
+            arguments.append(options[column])
+    query += ' ORDER BY rowid LIMIT ?'
+    arguments.append(options['limit'])
+    reporter = lint._TextReporter()
+    for path, line, category, message in connection.execute(query, arguments):
+        reporter.Error(path, line, category, message)
+
+def _Regressions(connection, options):
+    since = options['since']
+    if since is None:
+        since = _LatestRun(connection, options['run'])
+    counts = ('SELECT path, category, COUNT(*) AS n FROM diagnostics '
+              'WHERE run = ? GROUP BY path, category')
+    rows = connection.execute(
+            'SELECT now.path, now.category, now.n - COALESCE(old.n, 0) AS added '
+            'FROM (%s) AS now LEFT JOIN (%s) AS old '
+            'ON now.path = old.path AND now.category = old.category '
+            'WHERE now.n > COALESCE(old.n, 0) '
+            'ORDER BY added DESC, now.path, now.category LIMIT ?' % (counts, counts),
+            (options['run'], since, options['limit']))
+    for path, category, added in rows:
+        print('%+6d %s [%s]' % (added, path, category))
+
+_QUESTIONS = {
+    'runs': _Runs,
+    'files': _Files,
+    'categories': _Categories,
+    'errors': _Errors,
+    'regressions': _Regressions,
+}
+
+def Query(argv):
+    """
+    Answer a question about the runs in a store, printing the results
+    """
+    try:
+        (opts, args) = getopt.getopt(argv, '', ['run=', 'since=', 'limit=', 'path=',
+                                                'category='])
+    except getopt.GetoptError:
+        lint.PrintUsage('Invalid Arguments')
+    options = {'run': None, 'since': None, 'limit': -1, 'path': None, 'category': None}
+    try:
+        for (opt, val) in opts:
+            name = opt[2:]
+            options[name] = int(val) if name in ('run', 'since', 'limit') else val
+    except ValueError:
+        lint.PrintUsage('run, since and limit expect an integer value')
+    if len(args) != 2 or args[1] not in _QUESTIONS:
+        lint.PrintUsage('Expected a store and one of: ' + ', '.join(sorted(_QUESTIONS)))
+    filename, question = args
+    if not os.path.exists(filename):
+        lint.PrintUsage('No store at %s' % filename)
+    connection = sqlite3.connect(filename)
+    try:
+        if options['run'] is None:
+            options['run'] = _LatestRun(connection)
+        _QUESTIONS[question](connection, options)
+    finally:
+        connection.close()
+    return 0
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""
+Copyright 2009 Richard Quirk
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may not
+use this file except in compliance with the License. You may obtain a copy of
+the License at http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations under
+the License.
+"""
+import asyncio
+import concurrent.futures
+import os
+import shutil
+import tempfile
+import unittest
+import cmakelint.aio
+import cmakelint.main
+
+def Collect(paths, **kwargs):
+    async def run():
+        return [result async for result in cmakelint.aio.lint_paths(paths, **kwargs)]
+    return asyncio.run(run())
+
+class CMakeLintAioTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        cmakelint.main._lint_state.filters = []
+        self.paths = []
+        for i in range(12):
+            path = os.path.join(self.tmpdir, '%d' % i, 'CMakeLists.txt')
+            os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as f:
+                f.write('project(foo)\n' + 'foo() \n' * (i % 3))
+            self.paths.append(path)
+        self.paths.append(os.path.join(self.tmpdir, 'foo.h.in'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        cmakelint.main._lint_state = cmakelint.main._CMakeLintState()
+
+    def testLintPaths(self):
+        results = Collect(self.paths, concurrency=3)
+        self.assertEqual(sorted(self.paths), sorted(r.filename for r in results))
+        by_name = dict((r.filename, r) for r in results)
+        self.assertTrue(by_name[self.paths[-1]].ignored)
+        for i, path in enumerate(self.paths[:-1]):
+            self.assertFalse(by_name[path].ignored)
+            self.assertEqual([(n + 2, 'whitespace/eol', 'Line ends in whitespace')
+                              for n in range(i % 3)], by_name[path].errors)
+
+    def testFilters(self):
+        cmakelint.main._lint_state.SetFilters('-whitespace/eol')
+        results = Collect(self.paths, concurrency=2)
+        self.assertEqual([], [error for r in results for error in r.errors])
+
+    def testSkipGenerated(self):
+        generated = os.path.join(self.tmpdir, 'build', 'cmake_install.cmake')
+        os.makedirs(os.path.dirname(generated))
+        with open(generated, 'w') as f:
+            f.write('foo() \n')
+        paths = self.paths[:3] + [generated]
+        def ignored():
+            return sorted(r.filename for r in Collect(paths, concurrency=2) if r.ignored)
+        self.assertEqual([generated], ignored())
+        state = cmakelint.main._lint_state
+        state.AddSkipPatterns('*/0/*')
+        self.assertEqual(sorted([self.paths[0], generated]), ignored())
+        state.include_generated = True
+        self.assertEqual([], ignored())
+        state.SetMaxSize('20')
+        self.assertEqual([self.paths[2]], ignored())
+
+    def testExecutor(self):
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            with self.assertRaises(ValueError):
+                Collect(self.paths, executor=executor)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+            self.assertEqual(len(self.paths), len(Collect(self.paths, executor=executor)))
+
+    def testStateRestored(self):
+        state = cmakelint.main._lint_state
+        result = cmakelint.aio._LintContents('CMakeLists.txt', ['foo() '],
+                                             cmakelint.aio.GetSettings())
+        self.assertEqual([(1, 'whitespace/eol', 'Line ends in whitespace')], result.errors)
+        self.assertIs(state, cmakelint.main._lint_state)
+
+    def testShutdownWaits(self):
+        waits = []
+        class Pool(concurrent.futures.ProcessPoolExecutor):
+            def shutdown(self, wait=True, **kwargs):
+                waits.append(wait)
+                super(Pool, self).shutdown(wait, **kwargs)
+        saved_pool = concurrent.futures.ProcessPoolExecutor
+        concurrent.futures.ProcessPoolExecutor = Pool
+        try:
+            Collect(self.paths, concurrency=2)
+        finally:
+            concurrent.futures.ProcessPoolExecutor = saved_pool
+        self.assertEqual([True], waits)
+
+    def testCancel(self):
+        async def run():
+            seen = []
+            lint = cmakelint.aio.lint_paths(self.paths * 20, concurrency=2)
+            async for result in lint:
+                seen.append(result)
+                if len(seen) == 3:
+                    break
+            await lint.aclose()
+            return seen
+        self.assertEqual(3, len(asyncio.run(run())))
+
+        async def cancelled():
+            async for _ in cmakelint.aio.lint_paths(self.paths * 20, concurrency=2):
+                await asyncio.sleep(10)
+        async def cancel():
+            task = asyncio.ensure_future(cancelled())
+            await asyncio.sleep(0.5)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                return True
+            return False
+        self.assertTrue(asyncio.run(cancel()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Copyright 2009 Richard Quirk
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may not
+use this file except in compliance with the License. You may obtain a copy of
+the License at http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations under
+the License.
+
+Time CleanComments against the character by character version it replaced,
+on a corpus where every line has a comment or quoted arguments, and on one
+where nearly half of the lines have neither.
+
+Syntax: cmakelint_benchmark.py [--seed=N] [--lines=N] [--repeat=N]
+"""
+from __future__ import print_function
+import getopt
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import cmakelint.main
+
+# lines that have comments or quoted arguments
+_COMMENTED_LINES = [
+    'set(SOURCES foo.c bar.c) # the sources',
+    'message(STATUS "Configuring ${PROJECT_NAME} version ${VERSION}")',
+    'if(NOT DEFINED FOO) # not set by the user',
+    '  set(FOO "default value" CACHE STRING "The value of foo")',
+    '  add_definitions(-DNAME="\\"quoted\\"") # escaped quotes',
+    'string(REGEX REPLACE "#.*$" "" LINE "${LINE}")',
+    '  install(FILES ${HEADERS} DESTINATION include) # public headers',
+    '# Copyright and licence header text that goes on for a while',
+]
+_PLAIN_LINES = [
+    'endif()',
+    'target_link_libraries(foo PRIVATE bar baz)',
+    '',
+]
+CORPORA = {
+    'comment-heavy': _COMMENTED_LINES,
+    'mixed': _COMMENTED_LINES + _PLAIN_LINES * 2,
+}
+
+def LegacyCleanComments(line, quote=False):
+    """
+    The CleanComments that looked at each character in turn, without
+    bracket arguments or bracket comments
+    """
+    if line.find('#') == -1 and line.find('"') == -1:
+        if quote:
+            return '', quote
+        else:
+            return line, quote
+    # else have to check for comment
+    prior = []
+    prev = ''
+    for char in line:
+        try:
+            if char == '"':
+                if prev != '\\':
+                    quote = not quote
+                    prior.append(char)
+                continue
+            elif char == '#' and not quote:
+                break
+            if not quote:
+                prior.append(char)
+        finally:
+            prev = char
+    return ''.join(prior).rstrip(), quote
+
+def MakeCorpus(seed, count, lines):
+    rng = random.Random(seed)
+    return [rng.choice(lines) for _ in range(count)]
+
+def CleanAll(clean, lines):
+    quote = False
+    cleaned = []
+    for line in lines:
+        line, quote = clean(line, quote)
+        cleaned.append(line)
+    return cleaned
+
+def main():
+    try:
+        opts, _ = getopt.getopt(sys.argv[1:], '', ['seed=', 'lines=', 'repeat='])
+    except getopt.GetoptError as ex:
+        sys.stderr.write('%s\n%s' % (ex, __doc__))
+        return 32
+    options = {'--seed': 0, '--lines': 100000, '--repeat': 5}
+    for opt, val in opts:
+        options[opt] = int(val)
+    for corpus in sorted(CORPORA):
+        lines = MakeCorpus(options['--seed'], options['--lines'], CORPORA[corpus])
+        if CleanAll(LegacyCleanComments, lines) != CleanAll(cmakelint.main.CleanComments, lines):
+            print('CleanComments does not match the legacy version on the %s corpus' % corpus)
+            return 1
+        # the two are timed in turn, so that a busy machine slows both
+        times = {'legacy': [], 'CleanComments': []}
+        for _ in range(options['--repeat']):
+            for name, clean in (('legacy', LegacyCleanComments),
+                                ('CleanComments', cmakelint.main.CleanComments)):
+                times[name].append(timeit.timeit(lambda: CleanAll(clean, lines), number=1))
+        times = dict((name, min(t)) for name, t in times.items())
+        print('%-14s legacy %.3fs  CleanComments %.3fs  speedup %.1fx' % (
+                corpus, times['legacy'], times['CleanComments'],
+                times['legacy'] / times['CleanComments']))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""
+Copyright 2009 Richard Quirk
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may not
+use this file except in compliance with the License. You may obtain a copy of
+the License at http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations under
+the License.
+
+Checks that the time taken to lint grows linearly with the size of the input.
+A short run of cmakelint_fuzz.py is included when CMAKELINT_FUZZ is set.
+"""
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import cmakelint_fuzz
+import cmakelint.main
+
+# Inputs are linted at 1x, 10x and 100x this size
+BASE_SIZE = 20
+# The largest input may take this many times longer per unit than the
+# smallest. Linear code stays close to 1, quadratic code reaches 100.
+SCALING_LIMIT = 10.0
+# Each timed run of a small input lints at least this many units
+MIN_TIMED_UNITS = BASE_SIZE * 30
+
+def Ignore(unused_filename, unused_linenumber, unused_category, unused_message):
+    pass
+
+def RunCheck(check, filename):
+    def run(lines):
+        clean_lines = cmakelint.main.CleansedLines(lines)
+        for i in clean_lines.LineNumbers():
+            check(filename, i, clean_lines, Ignore)
+    return run
+
+def RunProcessFile(filename):
+    def run(lines):
+        cmakelint_fuzz.Lint(filename, lines)
+    return run
+
+# Generators for inputs of a given size. Each is a list of lines.
+INPUTS = {
+    'commands': lambda n: ['set(VAR%d value)' % i for i in range(n)],
+    'unclosed': lambda n: ['foo('] * n,
+    'multiline': lambda n: ['set(VAR'] + ['  value'] * n + [')'],
+    'pragmas': lambda n: ['# lint_cmake: -whitespace/eol', 'foo() '] * n,
+    'logic': lambda n: ['if(FOO)', 'else(FOO)', 'endif(FOO)'] * n,
+    'include': lambda n: ['include('] * n,
+    'quotes': lambda n: ['message("', 'text # not a comment', '")'] * n,
+    'brackets': lambda n: ['set(A [==[', 'text ]] # "', ']==]) #[[', ']] foo()'] * n,
+    'long_brackets': lambda n: ['set(A ' + '[=[ ]] ]=] #[[ ]] ' * n + ')'],
+    'long_word': lambda n: ['else(' + 'a' * n],
+    'long_spaces': lambda n: ['foo(' + ' ' * n],
+    'long_args': lambda n: ['endif(' + 'b ' * n + ')'],
+    'unmatched_blocks': lambda n: ['if(A)'] * n + ['endforeach()'] * n + ['endif()'] * n,
+    'nested_blocks': lambda n: ['foreach(x)', 'if(A)'] * n + ['endforeach()'] * n,
+}
+
+# Regressions that are quicker to generate than to keep in the regressions
+# directory, as (input, size)
+GENERATED_REGRESSIONS = {
+    'pragmas': ('pragmas', 2000),
+    'unclosed-commands': ('unclosed', 3000),
+}
+
+CHECKS = [
+    ('CheckLineLength', RunCheck(cmakelint.main.CheckLineLength, 'CMakeLists.txt')),
+    ('CheckUpperLowerCase', RunCheck(cmakelint.main.CheckUpperLowerCase, 'CMakeLists.txt')),
+    ('CheckCommandSpaces', RunCheck(cmakelint.main.CheckCommandSpaces, 'CMakeLists.txt')),
+    ('CheckRepeatLogic', RunCheck(cmakelint.main.CheckRepeatLogic, 'CMakeLists.txt')),
+    ('CheckIndent', RunCheck(cmakelint.main.CheckIndent, 'CMakeLists.txt')),
+    ('CheckStyle', RunCheck(cmakelint.main.CheckStyle, 'CMakeLists.txt')),
+    ('CheckBlocks', RunCheck(cmakelint.main.CheckBlocks, 'CMakeLists.txt')),
+    ('CheckFindPackage', RunCheck(cmakelint.main.CheckFindPackage, 'FindFOO.cmake')),
+    ('_ProcessFile', RunProcessFile('CMakeLists.txt')),
+    ('_ProcessFile Find module', RunProcessFile('FindFOO.cmake')),
+]
+
+def TimePerUnit(run, make_input, size, repeats=2):
+    lines = make_input(size)
+    number = max(1, MIN_TIMED_UNITS // size)
+    best = None
+    for _ in range(repeats):
+        start = time.time()
+        for _ in range(number):
+            run(lines)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best / (size * number)
+
+class CMakeLintComplexityTest(unittest.TestCase):
+
+    def setUp(self):
+        self.old_filters = cmakelint.main._lint_state.filters
+        cmakelint.main._lint_state.filters = []
+
+    def tearDown(self):
+        cmakelint.main._lint_state.filters = self.old_filters
+
+    def assertScalesLinearly(self, name, run, input_name):
+        make_input = INPUTS[input_name]
+        # warm up caches so that the first measurement is not penalised
+        run(make_input(BASE_SIZE))
+        times = [TimePerUnit(run, make_input, BASE_SIZE * scale) for scale in (1, 10, 100)]
+        ratio = times[-1] / max(times[0], 1e-9)
+        self.assertTrue(ratio < SCALING_LIMIT,
+                        '%s on %s input: time per unit grew %.1fx from 1x to 100x (%s)' %
+                        (name, input_name, ratio, ', '.join('%.2g' % t for t in times)))
+
+    def testScaling(self):
+        for name, run in CHECKS:
+            for input_name in sorted(INPUTS):
+                self.assertScalesLinearly(name, run, input_name)
+
+    def testRegressions(self):
+        regressions = []
+        directory = cmakelint_fuzz.REGRESSIONS_DIR
+        for name in sorted(os.listdir(directory)):
+            with open(os.path.join(directory, name)) as f:
+                regressions.append((name, f.readlines()))
+        for name in sorted(GENERATED_REGRESSIONS):
+            input_name, size = GENERATED_REGRESSIONS[name]
+            regressions.append((name, INPUTS[input_name](size)))
+        for name, contents in regressions:
+            for filename in ('CMakeLists.txt', 'FindFOO.cmake'):
+                elapsed = cmakelint_fuzz.TimeLint(filename, contents)
+                self.assertTrue(elapsed < 2.0, '%s took %.2fs' % (name, elapsed))
+
+    @unittest.skipUnless(os.environ.get('CMAKELINT_FUZZ'),
+                         'depends on timing; set CMAKELINT_FUZZ=1 to run')
+    def testFuzz(self):
+        found = cmakelint_fuzz.Fuzz(seed=0, iterations=10)
+        self.assertEqual([], [(kind, filename) for kind, filename, _ in found])
+
+    def testSetFiltersKeepsEarlierFilters(self):
+        state = cmakelint.main._CMakeLintState()
+        state.SetFilters('-whitespace')
+        self.assertRaises(ValueError, state.SetFilters, 'bad')
+        state.SetFilters('+whitespace/eol')
+        self.assertEqual(['-whitespace', '+whitespace/eol'], state.filters)
+        self.assertFalse(state.ShouldPrint('whitespace/tabs'))
+        self.assertTrue(state.ShouldPrint('whitespace/eol'))
+        state.SetFilters('-whitespace/eol')
+        self.assertFalse(state.ShouldPrint('whitespace/eol'))
+        state.filters = []
+        self.assertTrue(state.ShouldPrint('whitespace/eol'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+"""
+Copyright 2009 Richard Quirk
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may not
+use this file except in compliance with the License. You may obtain a copy of
+the License at http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations under
+the License.
+
+Search for inputs that make cmakelint slow or that it can not finish.
+
+Random CMake-like files are linted, then grown and linted again. Inputs that
+take much longer per byte once grown, take too long or raise an exception
+are saved to the regressions directory, where cmakelint_complexity_test.py
+picks them up.
+
+Syntax: cmakelint_fuzz.py [--seed=N] [--iterations=N] [--save-dir=dir]
+"""
+from __future__ import print_function
+import getopt
+import hashlib
+import os
+import random
+import signal
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import cmakelint.main
+
+REGRESSIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               'complexity_regressions')
+# how many times larger an input is made when checking how it scales
+GROWTH = 100
+# the grown input may take this many times longer per byte before it is saved
+SLOWDOWN_LIMIT = 8.0
+# inputs are linted repeatedly until this many bytes have been timed
+MIN_TIMED_BYTES = 20000
+TIMEOUT = 10
+
+_FRAGMENTS = [
+    'set', 'SET', 'Set', 'if', 'endif', 'else', 'elseif', 'foreach',
+    'endforeach', 'function', 'endfunction', 'macro', 'endmacro', 'while',
+    'endwhile', 'include', 'find_package_handle_standard_args',
+    'FindPackageHandleStandardArgs', 'FOO', '${VAR}', 'NOT', 'AND',
+    '(', ')', '( ', ' )', '(', ')', '"', '\\"', '#', '# ', '[[', ']]',
+    '#[[', '[=[', ']=]', ' ', '  ', '\t', 'word', 'a', '\\', ';',
+    '# lint_cmake: -whitespace/eol', '# lint_cmake: +whitespace',
+    '# lint_cmake: bad',
+]
+
+
+class Timeout(Exception):
+    pass
+
+
+def _RaiseTimeout(signum, frame):
+    raise Timeout()
+
+
+def GenerateLine(rng, vocabulary=_FRAGMENTS):
+    return ''.join(rng.choice(vocabulary) for _ in range(rng.randint(0, 12)))
+
+
+def GenerateInput(rng, lines=None):
+    """
+    Return a list of lines made from a few fragments, so that similar
+    constructs are repeated as in real files
+    """
+    if lines is None:
+        lines = rng.randint(1, 40)
+    vocabulary = rng.sample(_FRAGMENTS, rng.randint(1, 8))
+    return [GenerateLine(rng, vocabulary) + '\n' for _ in range(lines)]
+
+
+def Grow(rng, contents, factor=GROWTH):
+    """
+    Make contents larger, either by repeating lines or by repeating a
+    fragment inside a line
+    """
+    if rng.random() < 0.5:
+        return contents * factor
+    grown = list(contents)
+    i = rng.randrange(len(grown))
+    line = grown[i].rstrip('\n')
+    start = rng.randint(0, len(line))
+    end = rng.randint(start, len(line))
+    piece = line[start:end] or rng.choice(_FRAGMENTS)
+    grown[i] = line[:start] + piece * factor + line[end:] + '\n'
+    return grown
+
+
+def Lint(filename, contents):
+    """
+    Run _ProcessFile over contents, throwing the output away
+    """
+    state = cmakelint.main._lint_state
+    saved = (state.errors, list(state.filters), sys.stdout)
+
+    class Devnull(object):
+        def write(self, _): pass
+        def flush(self): pass
+
+    sys.stdout = Devnull()
+    try:
+        cmakelint.main._ProcessFile(filename, contents)
+    finally:
+        state.errors, state.filters, sys.stdout = saved
+
+
+def TimeLint(filename, contents, timeout=TIMEOUT):
+    """
+    Return the time taken to lint contents, raising Timeout if it takes
+    longer than timeout seconds
+    """
+    use_alarm = hasattr(signal, 'setitimer')
+    if use_alarm:
+        old_handler = signal.signal(signal.SIGALRM, _RaiseTimeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        start = time.time()
+        Lint(filename, contents)
+        return time.time() - start
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, old_handler)
+
+
+def TimePerByte(filename, contents, repeats=3):
+    """
+    Return the best time per byte to lint contents. Small inputs are linted
+    several times per measurement so that the timer resolution is not an
+    issue.
+    """
+    size = max(1, sum(len(line) for line in contents))
+    number = max(1, MIN_TIMED_BYTES // size)
+    best = None
+    for _ in range(repeats):
+        elapsed = sum(TimeLint(filename, contents) for _ in range(number))
+        if best is None or elapsed < best:
+            best = elapsed
+    return best / (size * number)
+
+
+def SaveRegression(save_dir, kind, contents):
+    text = ''.join(contents)
+    name = '%s-%s.cmake' % (kind, hashlib.sha1(text.encode('utf-8')).hexdigest()[:12])
+    if not os.path.isdir(save_dir):
+        os.makedirs(save_dir)
+    path = os.path.join(save_dir, name)
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
+
+
+def CheckInput(rng, filename, contents):
+    """
+    Return (kind, contents) for a problem found with contents, or None
+    """
+    grown = Grow(rng, contents)
+    try:
+        if TimePerByte(filename, grown) > SLOWDOWN_LIMIT * TimePerByte(filename, contents):
+            return ('slow', grown)
+    except Timeout:
+        return ('timeout', grown)
+    except Exception:
+        return ('crash', grown)
+    return None
+
+
+def Fuzz(seed, iterations, save_dir=None):
+    """
+    Return a list of (kind, filename, contents) for the problems found
+    """
+    rng = random.Random(seed)
+    found = []
+    for _ in range(iterations):
+        filename = rng.choice(['CMakeLists.txt', 'FindFOO.cmake', 'FindFoo.cmake'])
+        problem = CheckInput(rng, filename, GenerateInput(rng))
+        if problem is None:
+            continue
+        kind, contents = problem
+        found.append((kind, filename, contents))
+        if save_dir:
+            print('%s: %s' % (kind, SaveRegression(save_dir, kind, contents)))
+    return found
+
+
+def main():
+    try:
+        opts, _ = getopt.getopt(sys.argv[1:], '', ['seed=', 'iterations=', 'save-dir='])
+    except getopt.GetoptError:
+        sys.stderr.write(__doc__)
+        return 32
+    seed = int(time.time())
+    iterations = 1000
+    save_dir = REGRESSIONS_DIR
+    for opt, val in opts:
+        if opt == '--seed':
+            seed = int(val)
+        elif opt == '--iterations':
+            iterations = int(val)
+        elif opt == '--save-dir':
+            save_dir = val
+    print('seed %d' % seed)
+    found = Fuzz(seed, iterations, save_dir)
+    print('%d problems found' % len(found))
+    if found:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
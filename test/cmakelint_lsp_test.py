@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+Copyright 2009 Richard Quirk
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may not
+use this file except in compliance with the License. You may obtain a copy of
+the License at http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations under
+the License.
+"""
+import io
+import json
+import random
+import unittest
+import cmakelint.lsp
+import cmakelint.main
+
+SAMPLE = '''# lint_cmake: -whitespace/indent
+project(foo)
+ set(VAR
+     value )
+if(FOO)
+  message("quoted # not a comment
+  still quoted")
+else(FOO)
+endif()
+'''
+
+FRAGMENTS = ['set(', 'SET(', ')', ' ', '\t', '"', '#', 'endif(FOO)', 'foo',
+             '\n', '\n', '# lint_cmake: -whitespace/eol\n', 'include(',
+             'FindPackageHandleStandardArgs', 'FIND_PACKAGE_HANDLE_STANDARD_ARGS(',
+             'if(A)\n', '  foreach(x)', 'endforeach()', 'else()']
+
+def Summary(diagnostics):
+    return sorted((d['range']['start']['line'], d['code'], d['message']) for d in diagnostics)
+
+def Offset(text, line, character):
+    lines = text.split('\n')
+    return sum(len(l) + 1 for l in lines[:line]) + character
+
+def RandomPosition(rng, text):
+    lines = text.split('\n')
+    line = rng.randrange(len(lines))
+    return line, rng.randint(0, len(lines[line]))
+
+class CMakeLintLspTest(unittest.TestCase):
+
+    def setUp(self):
+        cmakelint.main._lint_state.filters = []
+
+    def assertIncrementalMatchesFull(self, uri, text, rng, edits):
+        document = cmakelint.lsp.Document(uri, text)
+        for _ in range(edits):
+            start = RandomPosition(rng, text)
+            end = RandomPosition(rng, text)
+            if end < start:
+                start, end = end, start
+            new_text = ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 4)))
+            document.ApplyChange({
+                'range': {'start': {'line': start[0], 'character': start[1]},
+                          'end': {'line': end[0], 'character': end[1]}},
+                'text': new_text})
+            text = (text[:Offset(text, start[0], start[1])] + new_text +
+                    text[Offset(text, end[0], end[1]):])
+            # several changes can come before diagnostics are published
+            if rng.random() < 0.3:
+                continue
+            expected = cmakelint.lsp.Document(uri, text)
+            self.assertEqual(expected.clean_lines.raw_lines, document.clean_lines.raw_lines)
+            self.assertEqual(expected.Diagnostics(), document.Diagnostics())
+
+    def testIncrementalEdits(self):
+        rng = random.Random(42)
+        for uri in ('file:///src/CMakeLists.txt', 'file:///src/FindFOO.cmake'):
+            self.assertIncrementalMatchesFull(uri, SAMPLE, rng, 300)
+
+    def testIncrementalEditsBlockIndent(self):
+        cmakelint.main._lint_state.block_indent = True
+        try:
+            self.assertIncrementalMatchesFull('file:///src/CMakeLists.txt', SAMPLE,
+                                              random.Random(7), 300)
+        finally:
+            cmakelint.main._lint_state.block_indent = False
+
+    def testDiagnosticsMatchProcessFile(self):
+        found = []
+        def errors(filename, linenumber, category, message):
+            found.append((max(linenumber - 1, 0), category, message))
+        saved_emit = cmakelint.main.EmitError
+        cmakelint.main.EmitError = errors
+        try:
+            cmakelint.main.ProcessFile('/src/CMakeLists.txt', SAMPLE.splitlines(True))
+        finally:
+            cmakelint.main.EmitError = saved_emit
+        document = cmakelint.lsp.Document('file:///src/CMakeLists.txt', SAMPLE)
+        self.assertEqual(sorted(found), Summary(document.Diagnostics()))
+        self.assertNotEqual([], found)
+
+    def testDiagnosticsFollowFilters(self):
+        document = cmakelint.lsp.Document('file:///src/CMakeLists.txt', SAMPLE)
+        self.assertIn('readability/logic', [d['code'] for d in document.Diagnostics()])
+        cmakelint.main._lint_state.filters = ['-readability/logic']
+        self.assertNotIn('readability/logic', [d['code'] for d in document.Diagnostics()])
+
+    def testServer(self):
+        def Message(message):
+            body = json.dumps(message).encode('utf-8')
+            return b'Content-Length: ' + str(len(body)).encode('ascii') + b'\r\n\r\n' + body
+        uri = 'file:///src/CMakeLists.txt'
+        requests = b''.join([
+            Message({'jsonrpc': '2.0', 'id': 1, 'method': 'initialize', 'params': {}}),
+            Message({'jsonrpc': '2.0', 'method': 'textDocument/didOpen', 'params': {
+                'textDocument': {'uri': uri, 'text': 'foo() \n'}}}),
+            Message({'jsonrpc': '2.0', 'method': 'textDocument/didChange', 'params': {
+                'textDocument': {'uri': uri},
+                'contentChanges': [{'range': {'start': {'line': 0, 'character': 5},
+                                              'end': {'line': 0, 'character': 6}},
+                                    'text': ''}]}}),
+            Message({'jsonrpc': '2.0', 'id': 2, 'method': 'unknown/method'}),
+            Message({'jsonrpc': '2.0', 'id': 3, 'method': 'shutdown'}),
+            Message({'jsonrpc': '2.0', 'method': 'exit'}),
+        ])
+        output = io.BytesIO()
+        server = cmakelint.lsp.Server(io.BytesIO(requests), output)
+        self.assertEqual(0, server.Run())
+        output.seek(0)
+        replies = []
+        while True:
+            message = cmakelint.lsp.ReadMessage(output)
+            if message is None:
+                break
+            replies.append(message)
+        self.assertEqual(2, replies[0]['result']['capabilities']['textDocumentSync']['change'])
+        self.assertEqual(['Line ends in whitespace'],
+                         [d['message'] for d in replies[1]['params']['diagnostics']])
+        self.assertEqual([], replies[2]['params']['diagnostics'])
+        self.assertEqual(-32601, replies[3]['error']['code'])
+        self.assertEqual(3, replies[4]['id'])
+
+if __name__ == '__main__':
+    unittest.main()
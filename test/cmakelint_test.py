@@ -13,11 +13,25 @@ License for the specific language governing permissions and limitations under
 the License.
 """
 import contextlib
+import io
+import json
+import shutil
+import subprocess
 import sys
+import tarfile
+import tempfile
 import unittest
+import zipfile
 import cmakelint.main
 import cmakelint.__version__
 import os
+import random
+
+try:
+    # accepts both str and unicode, as both are printed on Python 2
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
 
 # stderr suppression from https://stackoverflow.com/a/1810086
 @contextlib.contextmanager
@@ -32,6 +46,18 @@ def nostderr():
     finally:
         sys.stderr = savestderr
 
+@contextlib.contextmanager
+def nostdout():
+    savestdout = sys.stdout
+    class Devnull(object):
+        def write(self, _): pass
+        def flush(self): pass
+    sys.stdout = Devnull()
+    try:
+        yield
+    finally:
+        sys.stdout = savestdout
+
 class ErrorCollector(object):
     def __init__(self):
         self._errors = []
@@ -45,6 +71,31 @@ class ErrorCollector(object):
             return ''.join(self._errors)
         return self._errors
 
+def CharacterCleanComments(line, quote=False):
+    """
+    CleanComments one character at a time, as it used to be, for lines
+    without bracket arguments or bracket comments
+    """
+    if line.find('#') == -1 and line.find('"') == -1:
+        if quote:
+            return '', quote
+        else:
+            return line, quote
+    prior = []
+    escaped = False
+    for char in line:
+        if char == '"':
+            if not escaped:
+                quote = not quote
+                prior.append(char)
+        elif char == '#' and not quote:
+            break
+        elif not quote:
+            prior.append(char)
+        # a backslash escapes the next character, unless it is escaped
+        escaped = char == '\\' and not escaped
+    return ''.join(prior).rstrip(), quote
+
 class CMakeLintTestBase(unittest.TestCase):
     def doTestLint(self, code, expected_message):
         errors = ErrorCollector()
@@ -142,6 +193,39 @@ class CMakeLintTest(CMakeLintTestBase):
                 ('")', False),
                 cmakelint.main.CleanComments(' end of comment") ', True))
 
+    def testCleanCommentBrackets(self):
+        self.assertEqual(('set(A [[]])', False),
+                         cmakelint.main.CleanComments('set(A [[ "a # b ]]) # c'))
+        self.assertEqual(('set(A [==[', ']==]'),
+                         cmakelint.main.CleanComments('set(A [==[ ( ]] # '))
+        self.assertEqual(('', ']==]'), cmakelint.main.CleanComments('  ]=] )', ']==]'))
+        self.assertEqual((']==])', False), cmakelint.main.CleanComments(' ]] ]==])', ']==]'))
+        self.assertEqual(('foo', '#]]'), cmakelint.main.CleanComments('foo #[[ comment ('))
+        self.assertEqual(('', '#]]'), cmakelint.main.CleanComments(' ) " # ', '#]]'))
+        self.assertEqual((' bar()', False), cmakelint.main.CleanComments(' ) ]] bar() # x', '#]]'))
+        self.assertEqual(('message("" [[]] "")', False),
+                         cmakelint.main.CleanComments('message("[[" [[ " ]] "]]")'))
+        self.doTestMultiLineLint('set(A [[\n  ( "\n]])\n#[[ foo(\n]] bar()', '')
+        # only the start of an argument opens a bracket argument
+        self.assertEqual(('set(X a[[b)', False), cmakelint.main.CleanComments('set(X a[[b)'))
+        self.assertEqual(('set(X a[=[b [[]])', False),
+                         cmakelint.main.CleanComments('set(X a[=[b [[ c ]])'))
+        self.assertEqual(('[[', ']]'), cmakelint.main.CleanComments('[[ a'))
+        self.doTestMultiLineLint('set(X a[[b)\nfoo( a)', 'Mismatching spaces inside () after command')
+
+    def testCleanCommentLegacy(self):
+        # without brackets, the lines are cleaned as they were one character
+        # at a time
+        rng = random.Random(1)
+        pieces = ['a', ' ', '\t', '"', '\\', '\\"', '#', '(', ')', '[', ']', '=', 'set']
+        for _ in range(20000):
+            line = ''.join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+            if cmakelint.main._RE_CLEAN_BRACKET.search(line):
+                continue
+            for quote in (False, True):
+                self.assertEqual(CharacterCleanComments(line, quote),
+                                 cmakelint.main.CleanComments(line, quote))
+
     def testCommandSpaces(self):
         self.doTestMultiLineLint(
                 """project ()""",
@@ -279,6 +363,87 @@ class CMakeLintTest(CMakeLintTestBase):
     def testBackslashComment(self):
         self.doTestMultiLineLint( r'file(APPEND ${OUT} " \"") # comment\n', '')
 
+    def testEscapedBackslash(self):
+        self.assertEqual(('string(REPLACE "" "" P "")', False),
+                         cmakelint.main.CleanComments(r'string(REPLACE "\\" "/" P "${P}") # x'))
+        self.assertEqual(('set(A "" \\\\\\)', False),
+                         cmakelint.main.CleanComments(r'set(A "\\\"" \\\") # "'))
+        self.assertEqual(('")', False), cmakelint.main.CleanComments(r'\\") # x', True))
+        self.assertEqual(('set(A [[]] "")', False),
+                         cmakelint.main.CleanComments(r'set(A [[x]] "\\") # "'))
+        self.doTestMultiLineLint('foreach(P ${PATHS})\n'
+                                 '  if(WIN32)\n'
+                                 '    string(REPLACE "\\\\" "/" P "${P}")\n'
+                                 '  endif()\n'
+                                 'endforeach()\n', '')
+
+    def testBlockIndex(self):
+        clean_lines = cmakelint.main.CleansedLines([
+                'if(A)',
+                '  foreach(x ${L})',
+                '    message(${x})',
+                '  endforeach()',
+                'else()',
+                '  while(B)',
+                'endif()',
+                'endfunction()'])
+        blocks = clean_lines.GetBlocks()
+        self.assertEqual([0, 1, 2, 1, 0, 1, 0, 0], blocks.depths)
+        self.assertEqual([False, False, False, False, False, True, False, True],
+                         blocks.unmatched)
+
+    def testBlockIndexUpdate(self):
+        rng = random.Random(3)
+        pieces = ['if(A)', 'else()', 'endif()', 'foreach(x)', 'endforeach()',
+                  'function(f)', 'endfunction()', 'message(x)', 'set(A "', '")']
+        lines = [rng.choice(pieces) for _ in range(60)]
+        clean_lines = cmakelint.main.CleansedLines(list(lines))
+        blocks = clean_lines.GetBlocks()
+        old_states = list(zip(blocks.depths, blocks.unmatched))
+        for _ in range(500):
+            count = len(clean_lines.lines)
+            start = rng.randint(0, count - 1)
+            end = rng.randint(start, min(start + 2, count))
+            new_lines = [rng.choice(pieces) for _ in range(rng.randint(0, 3))]
+            stop, moved = clean_lines.Replace(start, end, new_lines)
+            expected = cmakelint.main.CleansedLines(list(clean_lines.raw_lines)).GetBlocks()
+            self.assertEqual(expected.depths, blocks.depths)
+            self.assertEqual(expected.unmatched, blocks.unmatched)
+            self.assertEqual(expected.openers, blocks.openers)
+            states = list(zip(expected.depths, expected.unmatched))
+            shift = len(new_lines) - (end - start)
+            for i in range(len(states)):
+                if start <= i < stop:
+                    continue
+                old = i if i < start else i - shift
+                self.assertEqual(states[i] != old_states[old], i in moved)
+            old_states = states
+
+    def testUnmatchedBlocks(self):
+        self.doTestMultiLineLint('if(A)\nendif()\nendif()\n',
+                                 'Unable to find the if() for this endif()')
+        self.doTestMultiLineLint('foreach(x ${L})\n  message(${x})\n',
+                                 'Unable to find the endforeach() for this foreach()')
+        self.doTestMultiLineLint('function(f)\n  if(A)\nendfunction()\nelse()\n',
+                                 ['Unable to find the endif() for this if()',
+                                  'Unable to find the if() for this else()'])
+        self.doTestMultiLineLint('message("\nendif()\n")\n', '')
+
+    def testBlockIndent(self):
+        code = ('if(A)\n'
+                '  set(B\n'
+                '      C)\n'
+                'else()\n'
+                '   message(B)\n'
+                '  endif()\n')
+        self.doTestMultiLineLint(code, 'Weird indentation; use 2 spaces')
+        cmakelint.main._lint_state.block_indent = True
+        try:
+            self.doTestMultiLineLint(code, ['Weird indentation; expected 2 spaces',
+                                            'Weird indentation; expected 0 spaces'])
+        finally:
+            cmakelint.main._lint_state.block_indent = False
+
     def testFalsePositiveSourceCompiles(self):
         self.doTestMultiLineLint((
             'CHECK_C_SOURCE_COMPILES("\n'
@@ -413,5 +578,465 @@ class CMakeLintTest(CMakeLintTestBase):
             cmakelint.main._ERROR_CATEGORIES = old_cats
             cmakelint.main._lint_state.spaces = old_spaces
 
+class CMakeLintFileTest(unittest.TestCase):
+    """Tests that run the linter over real files in a temporary directory"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.old_errors = cmakelint.main._lint_state.errors
+        self.old_metrics = cmakelint.main._lint_metrics
+        cmakelint.main._lint_state.filters = []
+        cmakelint.main._lint_metrics = cmakelint.main._CMakeLintMetrics()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        cmakelint.main._lint_state.errors = self.old_errors
+        cmakelint.main._lint_metrics = self.old_metrics
+        cmakelint.main._lint_state.filters = []
+        cmakelint.main._lint_state.files_from = None
+        cmakelint.main._lint_state.files_from_delimiter = '\n'
+        cmakelint.main._lint_state.stdin_filename = None
+        cmakelint.main._lint_state.read_ahead = 0
+        cmakelint.main._lint_state.dedupe = False
+        cmakelint.main._content_cache = {}
+        cmakelint.main._line_cache = cmakelint.main._LineResultCache(
+                cmakelint.main._DEFAULT_LINE_CACHE_SIZE)
+
+    def writeFile(self, name, contents):
+        path = os.path.join(self.tmpdir, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(contents)
+        return path
+
+    def testMetrics(self):
+        good = self.writeFile('CMakeLists.txt', 'project(foo)\nfoo()\n')
+        bad = self.writeFile('bad.cmake', 'foo() \n')
+        ignored = self.writeFile('foo.h.in', '')
+        with nostdout():
+            for filename in (good, bad, ignored):
+                cmakelint.main.ProcessFile(filename)
+        metrics_file = os.path.join(self.tmpdir, 'metrics.json')
+        cmakelint.main.WriteMetrics(metrics_file)
+        with open(metrics_file) as f:
+            metrics = json.load(f)
+        self.assertEqual(3, metrics['files_seen'])
+        self.assertEqual(2, metrics['files_linted'])
+        self.assertEqual(1, metrics['files_skipped'])
+        self.assertEqual(3, metrics['lines'])
+        self.assertEqual(1, metrics['categories']['whitespace/eol'])
+        self.assertEqual(0, metrics['categories']['whitespace/tabs'])
+        for key in ('wall_time', 'cpu_time', 'files_per_second',
+                    'lines_per_second', 'peak_rss_bytes'):
+            self.assertTrue(key in metrics)
+
+    def testReadFileList(self):
+        read = lambda text, delimiter='\n': list(
+                cmakelint.main.ReadFileList(io.StringIO(text), delimiter))
+        self.assertEqual(['a.cmake', 'b c.cmake'], read(u'a.cmake\r\n\nb c.cmake'))
+        self.assertEqual(['a.cmake', 'with\nnewline.cmake'],
+                         read(u'a.cmake\0with\nnewline.cmake\0', '\0'))
+        many = [u'dir/%d/CMakeLists.txt' % i for i in range(20000)]
+        self.assertEqual(many, read(u'\n'.join(many)))
+
+    def testFilesFrom(self):
+        first = self.writeFile('CMakeLists.txt', 'project(foo)\n')
+        second = self.writeFile('sub dir/foo.cmake', 'foo() \n')
+        file_list = self.writeFile('files.txt', second + '\0')
+        files = cmakelint.main.ParseArgs(['--config=None', '--null',
+                                          '--files-from=' + file_list, first])
+        self.assertEqual([first], files)
+        self.assertEqual([first, second], list(cmakelint.main.GetFilesToLint(files)))
+        with nostderr():
+            self.assertRaises(SystemExit, cmakelint.main.ParseArgs,
+                    ['--files-from=-', '--stdin-filename=foo.cmake'])
+
+    def testStdinContents(self):
+        self.assertEqual([], cmakelint.main.ParseArgs(
+                ['--config=None', '--stdin-filename=CMakeLists.txt']))
+        with nostdout():
+            cmakelint.main.ProcessFile('does/not/exist/CMakeLists.txt',
+                                       ['project(foo)\n', 'foo() \n'])
+        self.assertEqual(1, cmakelint.main._lint_metrics.files_linted)
+        self.assertEqual(1, cmakelint.main._lint_metrics.categories['whitespace/eol'])
+
+    def testReadAhead(self):
+        names = [self.writeFile('%d.cmake' % i, 'set(A %d)\n' % i) for i in range(50)]
+        names.insert(10, os.path.join(self.tmpdir, 'ignored.h.in'))
+        results = list(cmakelint.main.ReadAhead(names, 4))
+        self.assertEqual(names, [name for name, _ in results])
+        self.assertEqual(None, results[10][1])
+        self.assertEqual(['set(A 0)\n'], results[0][1])
+        self.assertEqual(['set(A 49)\n'], results[-1][1])
+
+        missing = [names[0], os.path.join(self.tmpdir, 'missing.cmake')]
+        results = cmakelint.main.ReadAhead(missing, 2)
+        self.assertEqual(names[0], next(results)[0])
+        self.assertRaises(IOError, next, results)
+
+        cmakelint.main._lint_state.SetReadAhead('0')
+        self.assertEqual([(names[0], None)], list(cmakelint.main.ReadFiles(names[:1])))
+        self.assertRaises(ValueError, cmakelint.main._lint_state.SetReadAhead, '-1')
+
+    def lintOutput(self, filenames):
+        output = StringIO()
+        savestdout = sys.stdout
+        sys.stdout = output
+        try:
+            for filename in filenames:
+                cmakelint.main.ProcessFile(filename)
+        finally:
+            sys.stdout = savestdout
+        return output.getvalue()
+
+    def testDedupe(self):
+        package = ('# lint_cmake: -whitespace/eol\n'
+                   'include(FindPackageHandleStandardArgs) \n'
+                   'FIND_PACKAGE_HANDLE_STANDARD_ARGS(FOO DEFAULT_MSG)\n'
+                   'set(X\tY)\n')
+        names = [self.writeFile('a/FindFOO.cmake', package),
+                 self.writeFile('b/FindFOO.cmake', package),
+                 self.writeFile('c/FindFoo.cmake', package),
+                 self.writeFile('d/FindBAR.cmake', package),
+                 self.writeFile('e/foo.cmake', package),
+                 self.writeFile('f/foo.cmake', package)]
+        expected = self.lintOutput(names)
+        cmakelint.main._lint_state.dedupe = True
+        self.assertEqual(expected, self.lintOutput(names))
+        self.assertEqual(3, cmakelint.main._lint_metrics.files_deduplicated)
+        self.assertEqual([], cmakelint.main._lint_state.filters)
+
+    def runMain(self, argv):
+        """
+        Run main() with a fresh lint state, returning the exit status and
+        what was written to stdout and stderr
+        """
+        stdout = StringIO()
+        stderr = StringIO()
+        saved = (sys.argv, sys.stdout, sys.stderr, cmakelint.main._lint_state)
+        sys.argv = ['cmakelint'] + argv
+        sys.stdout, sys.stderr = stdout, stderr
+        cmakelint.main._lint_state = cmakelint.main._CMakeLintState()
+        try:
+            status = cmakelint.main.main()
+        finally:
+            sys.argv, sys.stdout, sys.stderr, cmakelint.main._lint_state = saved
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    def testShardMerge(self):
+        names = []
+        for i in range(30):
+            contents = 'set(A %d)\n' % i
+            if i % 3 == 0:
+                contents += 'foo() \n'
+            names.append(self.writeFile('%d/CMakeLists.txt' % i, contents))
+        names.append(self.writeFile('ignored.h.in', ''))
+        expected = self.runMain(['--config=None'] + names)
+        self.assertEqual(1, expected[0])
+
+        outputs = []
+        for shard in range(1, 4):
+            output = os.path.join(self.tmpdir, 'shard%d.json' % shard)
+            status, stdout, stderr = self.runMain(
+                    ['--config=None', '--shard=%d/3' % shard, '--shard-output=' + output] + names)
+            self.assertEqual('', stdout + stderr)
+            outputs.append(output)
+        self.assertEqual(expected, self.runMain(['merge'] + outputs))
+        self.assertEqual(expected, self.runMain(['merge'] + list(reversed(outputs))))
+        with nostderr():
+            self.assertRaises(SystemExit, self.runMain, ['merge'] + outputs[:2])
+            self.assertRaises(SystemExit, self.runMain, ['--shard=4/3', 'foo.cmake'])
+
+        # quiet from the config file of the shards applies to the merge
+        config = self.writeFile('quiet.cfg', 'quiet\n')
+        clean = names[1:3]
+        expected = self.runMain(['--config=' + config] + clean)
+        self.assertEqual((0, '', ''), expected)
+        for shard in range(1, 3):
+            self.runMain(['--config=' + config, '--shard=%d/2' % shard,
+                          '--shard-output=' + outputs[shard - 1]] + clean)
+        self.assertEqual(expected, self.runMain(['merge'] + outputs[:2]))
+
+    def testArchives(self):
+        self.writeFile('src/CMakeLists.txt', 'project(foo)\nfoo() \n')
+        self.writeFile('src/cmake/FindFOO.cmake',
+                       'include(FindPackageHandleStandardArgs)\n'
+                       'find_package_handle_standard_args(FOO DEFAULT_MSG FOO_LIBRARY) \n')
+        self.writeFile('src/foo.c', 'int main() { return 0; } \n')
+        source = os.path.join(self.tmpdir, 'src')
+        tar_name = os.path.join(self.tmpdir, 'foo-1.0.tar.gz')
+        with tarfile.open(tar_name, 'w:gz') as archive:
+            archive.add(source, 'foo-1.0')
+        zip_name = os.path.join(self.tmpdir, 'foo-1.0.zip')
+        with zipfile.ZipFile(zip_name, 'w') as archive:
+            for name in ('CMakeLists.txt', 'foo.c', 'cmake/FindFOO.cmake'):
+                archive.write(os.path.join(source, name), 'foo-1.0/' + name)
+        expected = [
+            '%s!foo-1.0/CMakeLists.txt:2: Line ends in whitespace [whitespace/eol]',
+            '%s!foo-1.0/cmake/FindFOO.cmake:2: Line ends in whitespace [whitespace/eol]',
+        ]
+        for name in (tar_name, zip_name):
+            status, stdout, stderr = self.runMain(['--config=None', name])
+            self.assertEqual(1, status)
+            self.assertEqual(sorted(line % name for line in expected),
+                             sorted(stdout.splitlines()))
+            self.assertEqual('Total Errors: 2\n', stderr)
+            self.assertEqual((status, stdout, stderr),
+                             self.runMain(['--config=None', '--read-ahead=2', name]))
+        output = os.path.join(self.tmpdir, 'shard.json')
+        self.runMain(['--config=None', '--shard-output=' + output, tar_name, zip_name])
+        self.assertEqual(self.runMain(['--config=None', tar_name, zip_name]),
+                         self.runMain(['merge', output]))
+
+        # members at the top level of the archive are checked by their own
+        # names
+        self.writeFile('top/CMakeLists.txt', 'project(foo)\nfoo() \n')
+        self.writeFile('top/FindFoo.cmake', 'set(FOO 1)\n')
+        top_name = os.path.join(self.tmpdir, 'top.tar.gz')
+        with tarfile.open(top_name, 'w:gz') as archive:
+            for name in ('CMakeLists.txt', 'FindFoo.cmake'):
+                archive.add(os.path.join(self.tmpdir, 'top', name), name)
+        status, stdout, stderr = self.runMain(['--config=None', top_name])
+        self.assertEqual([
+            '%s!CMakeLists.txt:2: Line ends in whitespace [whitespace/eol]' % top_name,
+            '%s!FindFoo.cmake:0: Find modules should use uppercase names; '
+            'consider using FindFOO.cmake [convention/filename]' % top_name,
+            '%s!FindFoo.cmake:0: Package should include FindPackageHandleStandardArgs '
+            '[package/consistency]' % top_name,
+            '%s!FindFoo.cmake:0: Package should use FIND_PACKAGE_HANDLE_STANDARD_ARGS '
+            '[package/consistency]' % top_name,
+        ], stdout.splitlines())
+
+    def testProfiles(self):
+        strict = self.writeFile('strict', 'linelength=40\n')
+        relaxed = self.writeFile('relaxed', 'filter=-whitespace\nspaces=4\nlinelength=120\n')
+        legacy = self.writeFile('legacy', 'filter=-linelength\nlinelength=40\n')
+        lint_file = self.writeFile('CMakeLists.txt',
+                '# lint_cmake: +whitespace/indent\n'
+                'project(foo)\n'
+                'if(FOO)\n'
+                '  set(A_VERY_LONG_VARIABLE_NAME "with a long value") \n'
+                '# lint_cmake: -whitespace/eol\n'
+                '   foo() \n'
+                'ENDIF()\n')
+        status, stdout, stderr = self.runMain(
+                ['--config=None', '--profile-config=strict:' + strict,
+                 '--profile-config=relaxed:' + relaxed,
+                 '--profile-config=legacy:' + legacy, lint_file])
+        self.assertEqual(1, status)
+        for name, config in (('strict', strict), ('relaxed', relaxed), ('legacy', legacy)):
+            _, expected_stdout, expected_stderr = self.runMain(['--config=' + config, lint_file])
+            self.assertEqual(expected_stdout.splitlines(),
+                             [line[len(name) + 3:] for line in stdout.splitlines()
+                              if line.startswith('[%s] ' % name)])
+            self.assertTrue(('[%s] %s' % (name, expected_stderr)) in stderr)
+        with nostderr():
+            self.assertRaises(SystemExit, self.runMain, ['--profile-config=strict', lint_file])
+            self.assertRaises(SystemExit, self.runMain,
+                    ['--profile-config=a:' + strict, '--profile-config=a:' + strict, lint_file])
+            self.assertRaises(SystemExit, self.runMain,
+                    ['--profile-config=a:' + strict, '--shard=1/2', lint_file])
+
+    def testGitRev(self):
+        repository = os.path.join(self.tmpdir, 'repository')
+        self.writeFile('repository/CMakeLists.txt', 'project(foo)\nfoo() \n')
+        self.writeFile('repository/sub/bar.cmake', 'bar()\n\tbaz()\n')
+        self.writeFile('repository/sub/bar.c', 'int bar; \n')
+        def git(*args):
+            subprocess.check_call(('git', '-c', 'user.name=cmakelint',
+                                   '-c', 'user.email=cmakelint@example.com') + args,
+                                  cwd=repository, stdout=subprocess.PIPE,
+                                  stderr=subprocess.PIPE)
+        try:
+            git('init', '-q')
+        except OSError:
+            self.skipTest('git is not installed')
+        git('add', '.')
+        git('commit', '-q', '-m', 'first')
+        git('clone', '-q', '--bare', '.', os.path.join(self.tmpdir, 'bare.git'))
+        self.writeFile('repository/CMakeLists.txt', 'project(foo)\n')
+        expected = [
+            'CMakeLists.txt:2: Line ends in whitespace [whitespace/eol]',
+            'sub/bar.cmake:2: Tab found; please use spaces [whitespace/tabs]',
+        ]
+        cwd = os.getcwd()
+        os.chdir(os.path.join(self.tmpdir, 'bare.git'))
+        try:
+            status, stdout, stderr = self.runMain(['--config=None', '--git-rev=HEAD'])
+            self.assertEqual(expected, stdout.splitlines())
+            self.assertEqual((1, 'Total Errors: 2\n'), (status, stderr))
+            self.assertEqual(expected[1:], self.runMain(
+                    ['--config=None', '--git-rev=HEAD', 'sub'])[1].splitlines())
+            with nostderr():
+                self.assertRaises(SystemExit, self.runMain, ['--git-rev=no-such-rev'])
+        finally:
+            os.chdir(cwd)
+
+    def testLineCache(self):
+        lines = [
+            'project(foo) \n',
+            'if(FOO)\n',
+            '  set( VAR\n',
+            '    value)\n',
+            '  set( VAR\n',
+            '    value )\n',
+            '  Set(A 1)\n',
+            'endif(FOO)\n',
+            'IF(FOO)\n',
+            'ENDIF(FOO)\n',
+            'endif(FOO)\n',
+        ]
+        def lint(size):
+            cmakelint.main._line_cache = cmakelint.main._LineResultCache(size)
+            cmakelint.main._lint_metrics = cmakelint.main._CMakeLintMetrics()
+            found = []
+            saved_emit = cmakelint.main.EmitError
+            cmakelint.main.EmitError = lambda *error: found.append(error)
+            try:
+                cmakelint.main.ProcessFile('CMakeLists.txt', lines)
+                cmakelint.main.ProcessFile('CMakeLists.txt', lines)
+            finally:
+                cmakelint.main.EmitError = saved_emit
+            metrics = cmakelint.main._lint_metrics.Results()
+            return found, metrics['line_cache_hits'], metrics['line_cache_misses']
+        expected, hits, misses = lint(0)
+        self.assertEqual((0, 0), (hits, misses))
+        self.assertEqual(18, len(expected))
+        # too small to help, but the results are the same
+        self.assertEqual((expected, 0, 26), lint(1))
+        # 11 distinct lines, counting the two added around the file
+        self.assertEqual((expected, 15, 11), lint(100))
+        self.assertEqual(11, len(cmakelint.main._line_cache.results))
+
+    def testSkipGenerated(self):
+        names = [
+            self.writeFile('CMakeLists.txt', 'foo() \n'),
+            self.writeFile('build/cmake_install.cmake', 'foo() \n'),
+            self.writeFile('build/FooTargets-release.cmake',
+                           '# Generated CMake target import file for configuration "Release".\n'
+                           'foo() \n'),
+            self.writeFile('build/CMakeFiles/3.20/CMakeSystem.cmake', 'foo() \n'),
+            self.writeFile('banner.cmake', '# Generated by tool, DO NOT EDIT\nfoo() \n'),
+            self.writeFile('mention.cmake', 'foo() \n# code generated by this file\n'),
+            self.writeFile('large.cmake', 'foo() \n' + ('#' * 60 + '\n') * 2),
+            self.writeFile('custom/settings.cmake', 'foo() \n'),
+            self.writeFile('custom.cmake', '# autogen\nfoo() \n'),
+            self.writeFile('Modules/CTestTargets.cmake', 'foo() \n'),
+        ]
+        config = self.writeFile('cmakelintrc', 'skip=*/custom/*\nskip-banner=^# autogen\n'
+                                               'max-size=100\n')
+        def lintedFiles(args):
+            status, stdout, stderr = self.runMain(args + names)
+            lines = stdout.splitlines()
+            return ([line.split(':')[0] for line in lines if not line.startswith('Skipping')],
+                    [line for line in lines if line.startswith('Skipping')], stderr)
+        self.assertEqual((names[:1] + names[5:],
+                          ['Skipping file: %s (generated)' % name for name in names[1:5]],
+                          'Total Errors: 6\nSkipped Files: 4 (generated or too large)\n'),
+                         lintedFiles(['--config=None']))
+        linted, skipped, _ = lintedFiles(['--config=' + config])
+        self.assertEqual(names[:1] + names[5:6] + names[9:], linted)
+        self.assertIn('Skipping file: %s (too large)' % names[6], skipped)
+        self.assertEqual(names, lintedFiles(['--config=None', '--include-generated'])[0])
+        self.assertEqual(names[:1] + names[5:6] + names[7:],
+                         lintedFiles(['--config=None', '--max-size=100', '--read-ahead=3'])[0])
+        self.assertEqual((['foo() \n'], None), cmakelint.main.ReadFileUnlessSkipped(names[0]))
+        self.assertEqual((None, 'generated'), cmakelint.main.ReadFileUnlessSkipped(names[4]))
+        self.assertEqual('generated', cmakelint.main.GetContentsSkipReason(
+                'CMakeLists.txt', ['\n'] * 10 + ['# DO NOT EDIT\n']))
+
+    def testStore(self):
+        store = os.path.join(self.tmpdir, 'results.db')
+        first = self.writeFile('CMakeLists.txt', 'foo() \nbar() \n')
+        second = self.writeFile('sub/CMakeLists.txt', 'foo (x)\n')
+        status, stdout, _ = self.runMain(['--config=None', '--store=' + store, first, second])
+        self.assertEqual(1, status)
+        self.assertEqual(3, len(stdout.splitlines()))
+        self.writeFile('sub/CMakeLists.txt', 'foo (x)\n\tbar()\nbaz (x)\n')
+        self.runMain(['--config=None', '--store=' + store, first, second])
+
+        def query(question, *args):
+            status, stdout, _ = self.runMain(['query'] + list(args) + [store, question])
+            self.assertEqual(0, status)
+            return stdout.splitlines()
+        runs = query('runs')
+        self.assertEqual(2, len(runs))
+        self.assertTrue(runs[0].startswith('1 '))
+        self.assertIn('files=2 lines=3 errors=3', runs[0])
+        self.assertIn('files=2 lines=5 errors=5', runs[1])
+        self.assertEqual(['     3 ' + second, '     2 ' + first], query('files'))
+        self.assertEqual(['     2 ' + first, '     1 ' + second], query('files', '--run=1'))
+        self.assertEqual(['     2 whitespace/eol', '     2 whitespace/extra',
+                          '     1 whitespace/tabs'], query('categories'))
+        self.assertEqual(['     2 whitespace/eol'], query('categories', '--limit=1'))
+        self.assertEqual(["%s:%d: Extra spaces between '%s' and its () [whitespace/extra]" %
+                          (second, n, name) for n, name in ((1, 'foo'), (3, 'baz'))],
+                         query('errors', '--path=' + second, '--category=whitespace/extra'))
+        self.assertEqual(["%s:1: Extra spaces between 'foo' and its () [whitespace/extra]" %
+                          second], query('errors', '--run=1', '--category=whitespace/extra'))
+        self.assertEqual(['    +1 %s [whitespace/extra]' % second,
+                          '    +1 %s [whitespace/tabs]' % second], query('regressions'))
+        self.assertEqual([], query('regressions', '--run=1', '--since=2'))
+        with nostderr():
+            with self.assertRaises(SystemExit):
+                self.runMain(['query', store, 'everything'])
+            with self.assertRaises(SystemExit):
+                self.runMain(['query', os.path.join(self.tmpdir, 'missing.db'), 'runs'])
+
+    def testSplitLines(self):
+        lines = cmakelint.main.CleansedLines(
+                ['set(A', '  "(b"', '  c)', 'foo()', 'bar(', ')', 'baz()']).lines
+        self.assertEqual([(0, 3), (3, 4), (4, 6), (6, 7)], cmakelint.main.SplitLines(lines, 1))
+        self.assertEqual([(0, 4), (4, 7)], cmakelint.main.SplitLines(lines, 4))
+        self.assertEqual([(0, 7)], cmakelint.main.SplitLines(lines, 10))
+
+    def testSplitJobs(self):
+        # the case convention, the blocks and the Find module checks all
+        # depend on lines in other chunks
+        contents = ('# lint_cmake: -whitespace/eol\n'
+                    'message("text # (\n'
+                    'Mixed() ")\n'
+                    'IF(A)\n'
+                    '  include(FindPackageHandleStandardArgs) \n'
+                    'else(A)\n'
+                    '\tfoo( a)\n'
+                    '# lint_cmake: +whitespace/eol\n'
+                    '  set(B\n'
+                    '    c )\n'
+                    'ENDIF()\n'
+                    'endforeach() \n'
+                    'foreach(x y)\n')
+        names = [self.writeFile('CMakeLists.txt', contents),
+                 self.writeFile('FindFOO.cmake', contents * 3)]
+        for args in ([], ['--block-indent'], ['--line-cache=100'], ['--dedupe']):
+            args = ['--config=None'] + args + names
+            expected = self.runMain(args)
+            self.assertIn('Mismatching spaces', expected[1])
+            for jobs in ('1', '3'):
+                self.assertEqual(expected, self.runMain(['--split-jobs=' + jobs,
+                                                         '--split-lines=1'] + args))
+
+    def testSplitLargeFile(self):
+        # with the default size settings a file long enough to split is
+        # split, however large it is
+        count = cmakelint.main._DEFAULT_SPLIT_LINES
+        lines = ['set(VARIABLE_%d some_value) \n' % i for i in range(count)]
+        name = self.writeFile('CMakeLists.txt', ''.join(lines))
+        self.assertTrue(os.path.getsize(name) > 1024 * 1024)
+        expected = self.runMain(['--config=None', name])
+        self.assertEqual(count, expected[1].count('\n'))
+        split = []
+        saved = cmakelint.main.ProcessSplit
+        def ProcessSplit(filename, clean_lines, errors):
+            split.append(filename)
+            return saved(filename, clean_lines, errors)
+        cmakelint.main.ProcessSplit = ProcessSplit
+        try:
+            self.assertEqual(expected, self.runMain(['--config=None', '--split-jobs=2', name]))
+        finally:
+            cmakelint.main.ProcessSplit = saved
+        self.assertEqual([name], split)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,2 @@
+include(FindPackageHandleStandardArgs)
+include(
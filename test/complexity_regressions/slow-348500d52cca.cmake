@@ -0,0 +1,21 @@
+endmacroFindPackageHandleStandardArgs
+FindPackageHandleStandardArgs\")FindPackageHandleStandardArgs\"FindPackageHandleStandardArgsFindPackageHandleStandardArgsword)
+FindPackageHandleStandardArgsword)\"[[FindPackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStackageHandleStandardArgs\")endmacro)
+\"\"wordwordwordFindPackageHandleStandardArgs
+[[
+endmacro\[[word\endmacro
+FindPackageHandleStandardArgs
+\))word))
+wordword\FindPackageHandleStandardArgs\"FindPackageHandleStandardArgs))))
+wordword[[)[[)[[[[
+\)[[FindPackageHandleStandardArgs)FindPackageHandleStandardArgs)
+))endmacro
+endmacroFindPackageHandleStandardArgs\"[[FindPackageHandleStandardArgs\[[))endmacroendmacro\"
+endmacroFindPackageHandleStandardArgsFindPackageHandleStandardArgsendmacro)\FindPackageHandleStandardArgs
+FindPackageHandleStandardArgsendmacroendmacro\"word)
+)[[FindPackageHandleStandardArgs))
+[[[[endmacro)endmacro\")\"[[)
+\")\))[[wordendmacro
+)FindPackageHandleStandardArgs)[[
+))\
+\"\endmacro\
@@ -0,0 +1,7 @@
+\"(\"\"Set( Setendwhileendwhileendwhile
+endwhile\"SetSetFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgsFindPackageHandleStandardArgs
+
+SetendwhileendwhileSet( ( ( \"(( ( \"
+( (Set(endwhile(( ( (
+
+( \"( \"Set( Set